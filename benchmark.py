@@ -0,0 +1,427 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from muse_lingo import MuseLingo, snapshot_path_for, stream_rng, write_snapshot
+
+# MuseLingo benchmarks
+# Run with: python benchmark.py {startup,generate,translate,save,scaling,concurrency,all}
+#                               [--json OUT] [--baseline FILE]
+#           python benchmark.py compare BASELINE CURRENT [--threshold 0.15]
+#
+# Every result is a time, so lower is better; the unit is the name's suffix.
+
+# Words per theme the scaling benchmark grows the vocabulary through. The
+# full suite stops at 10^5: 10^6 takes minutes and several GB of memory.
+SCALING_SIZES = (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6)
+ALL_SCALING_SIZES = SCALING_SIZES[:3]
+
+# Thread counts the concurrency benchmark runs, and poems per task; each task
+# draws from its own stream_rng so results do not depend on scheduling
+CONCURRENCY_THREADS = (1, 2, 4, 8)
+CONCURRENCY_TASK_POEMS = 50
+
+# Relative slowdown past which compare flags a result as a regression
+REGRESSION_THRESHOLD = 0.15
+
+
+def _median_ms(func: Callable[[], object], repeat: int) -> float:
+    """Run ``func`` ``repeat`` times and return the median wall time in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def _per_call_us(func: Callable[[], object], number: int, repeat: int) -> float:
+    """Time ``repeat`` runs of ``number`` calls and return the best per-call time in microseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, time.perf_counter() - started)
+    return best / number * 1e6
+
+
+def _once_ms(func: Callable[[], object]) -> float:
+    """Time a single call in milliseconds."""
+    started = time.perf_counter()
+    func()
+    return (time.perf_counter() - started) * 1000
+
+
+def _default_muse(tmp: str) -> MuseLingo:
+    """A MuseLingo instance on the built-in default data, whatever is in the working directory."""
+    return MuseLingo(os.path.join(tmp, "missing.json"))
+
+
+def _grown_language_data(words_per_theme: int) -> Dict:
+    """Default language data with every theme grown to ``words_per_theme`` words."""
+    with tempfile.TemporaryDirectory() as tmp:
+        data = _default_muse(tmp).language_data.to_dict()
+    for language, language_data in data.items():
+        for theme, words in language_data["words"].items():
+            words.extend(f"{theme}{i}" for i in range(len(words), words_per_theme))
+    return data
+
+
+def benchmark_startup(words_per_theme: int = 0, repeat: int = 50) -> Dict[str, float]:
+    """Time MuseLingo() construction from defaults, pretty JSON, and the snapshot."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        missing_path = os.path.join(tmp, "missing.json")
+        results["defaults_ms"] = _median_ms(lambda: MuseLingo(missing_path), repeat)
+
+        # The JSON path exactly as save_language_data has always written it
+        data = _grown_language_data(words_per_theme)
+        json_path = os.path.join(tmp, "json_only.json")
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        results["json_ms"] = _median_ms(lambda: MuseLingo(json_path), repeat)
+        results["json_first_poem_ms"] = _median_ms(
+            lambda: MuseLingo(json_path).generate_poem("english", "love", "joy", "haiku"), repeat)
+
+        snapshot_data_path = os.path.join(tmp, "snapshot.json")
+        write_snapshot(data, snapshot_path_for(snapshot_data_path))
+        results["snapshot_ms"] = _median_ms(lambda: MuseLingo(snapshot_data_path), repeat)
+        results["snapshot_first_poem_ms"] = _median_ms(
+            lambda: MuseLingo(snapshot_data_path).generate_poem("english", "love", "joy", "haiku"), repeat)
+    return results
+
+
+def benchmark_generate(number: int = 500, repeat: int = 5) -> Dict[str, float]:
+    """Time generate_poem for every language and form on warm caches.
+
+    Also times every form on a weighted English theme.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        muse = _default_muse(tmp)
+        rng = random.Random(0)
+        for language in muse.languages:
+            for form in muse.poetry_forms:
+                results[f"{language}.{form}_us"] = _per_call_us(
+                    lambda: muse.generate_poem(language, "love", "joy", form, rng=rng), number, repeat)
+        words = list(muse.language_data["english"]["words"]["hope"])
+        muse.add_vocabulary("english", "hope", words, [float(i + 1) for i in range(len(words))])
+        for form in muse.poetry_forms:
+            results[f"english.weighted.{form}_us"] = _per_call_us(
+                lambda: muse.generate_poem("english", "hope", "joy", form, rng=rng), number, repeat)
+    return results
+
+
+def benchmark_translate(number: int = 500, repeat: int = 5) -> Dict[str, float]:
+    """Time the translated generate_poem path and build_translator for every language pair.
+
+    Also compares one poem in every language through translators with a
+    rendered concept poem.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        muse = _default_muse(tmp)
+        rng = random.Random(0)
+        pairs = [(source, target) for source in muse.languages for target in muse.languages if source != target]
+        for source, target in pairs:
+            translator = muse.build_translator(source, target)
+            results[f"generate.{source}.{target}_us"] = _per_call_us(
+                lambda: muse.generate_poem(source, "nature", "wonder", "free_verse", translator=translator, rng=rng),
+                number, repeat)
+        translators = [muse.build_translator("english", target) for target in muse.languages if target != "english"]
+
+        def via_translators():
+            poem = muse.generate_poem("english", "nature", "wonder", "free_verse", rng=rng)
+            return [muse.translate_poem(poem, translator) for translator in translators]
+        results["multilingual.translators_us"] = _per_call_us(via_translators, number, repeat)
+        results["multilingual.concepts_us"] = _per_call_us(
+            lambda: muse.generate_multilingual_poem("nature", "wonder", "free_verse", rng=rng), number, repeat)
+        for source, target in pairs:
+            def build():
+                muse.clear_translators()
+                muse.build_translator(source, target)
+            results[f"build_translator.{source}.{target}_us"] = _per_call_us(build, max(1, number // 10), repeat)
+    return results
+
+
+def benchmark_save(words_per_theme: int = 0, repeat: int = 5) -> Dict[str, float]:
+    """Time save_language_data: a journaled save of one new word and a full compaction."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        muse = _default_muse(tmp)
+        muse.language_data = _grown_language_data(words_per_theme)
+        data_path = os.path.join(tmp, "poetry_data.json")
+        results["full_ms"] = _median_ms(lambda: muse.compact_language_data(data_path), repeat)
+        counter = iter(range(sys.maxsize))
+
+        def journaled_save():
+            muse.add_vocabulary("english", "hope", [f"saved{next(counter)}"])
+            muse.save_language_data(data_path)
+        results["journal_ms"] = _median_ms(journaled_save, repeat * 10)
+    return results
+
+
+def benchmark_scaling(sizes: Sequence[int] = SCALING_SIZES, languages: Sequence[str] = ("english",),
+                      number: int = 200, repeat: int = 3,
+                      progress: Optional[Callable[[str], None]] = None) -> Dict[str, float]:
+    """Grow every theme of ``languages`` through ``sizes`` words with add_vocabulary.
+
+    At each size it times the growth itself, the first poem of every form
+    (which rebuilds the caches) and warm generation, building a translator,
+    a full and a journaled save, and startup from the saved snapshot.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        muse = _default_muse(tmp)
+        rng = random.Random(0)
+        data_path = os.path.join(tmp, "poetry_data.json")
+        source = languages[0]
+        target = next(language for language in muse.languages if language != source)
+        for size in sorted(sizes):
+            if progress:
+                progress(f"scaling to {size} words per theme")
+            prefix = f"{size}."
+
+            def grow():
+                for language in languages:
+                    for theme in muse.themes:
+                        have = len(muse.language_data[language]["words"][theme])
+                        muse.add_vocabulary(language, theme, [f"{theme}{i}" for i in range(have, size)])
+            results[prefix + "add_vocabulary_ms"] = _once_ms(grow)
+
+            for form in muse.poetry_forms:
+                generate = lambda: muse.generate_poem(source, "love", "joy", form, rng=rng)
+                results[f"{prefix}generate.{form}.first_ms"] = _once_ms(generate)
+                results[f"{prefix}generate.{form}_us"] = _per_call_us(generate, number, repeat)
+
+            results[prefix + "build_translator_ms"] = _once_ms(lambda: muse.build_translator(source, target))
+            results[prefix + "save_full_ms"] = _once_ms(lambda: muse.compact_language_data(data_path))
+            muse.add_vocabulary(source, "hope", [f"saved{size}"])
+            results[prefix + "save_journal_ms"] = _once_ms(lambda: muse.save_language_data(data_path))
+            results[prefix + "startup_snapshot_ms"] = _median_ms(lambda: MuseLingo(data_path), repeat)
+    return results
+
+
+def benchmark_concurrency(threads: Sequence[int] = CONCURRENCY_THREADS, poems: int = 20000,
+                          seed: int = 0) -> Dict[str, float]:
+    """Share one MuseLingo between threads and time the wall-clock cost per poem.
+
+    ``N_threads_us`` generates ``poems`` poems as tasks with seeded streams.
+    ``N_threads_writer_us`` has a ``concurrent`` instance draw from its
+    per-thread generators while another thread calls add_vocabulary every
+    millisecond. Throughput only scales with threads on a free-threaded build.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        muse = _default_muse(tmp)
+        specs = [(language, theme, "wonder", form)
+                 for language in muse.languages for theme in muse.themes for form in muse.poetry_forms]
+        tasks = range(max(1, poems // CONCURRENCY_TASK_POEMS))
+
+        def seeded_task(task: int) -> List[List[str]]:
+            rng = stream_rng(seed, task)
+            spec = specs[task % len(specs)]
+            return [muse.generate_poem(*spec, rng=rng) for _ in range(CONCURRENCY_TASK_POEMS)]
+        for count in threads:
+            with ThreadPoolExecutor(count) as pool:
+                started = time.perf_counter()
+                list(pool.map(seeded_task, tasks))
+                elapsed = time.perf_counter() - started
+            results[f"{count}_threads_us"] = elapsed / (len(tasks) * CONCURRENCY_TASK_POEMS) * 1e6
+
+        shared = MuseLingo(os.path.join(tmp, "missing.json"), concurrent=True)
+
+        def unseeded_task(task: int) -> List[List[str]]:
+            spec = specs[task % len(specs)]
+            return [shared.generate_poem(*spec) for _ in range(CONCURRENCY_TASK_POEMS)]
+        for count in threads:
+            stop = threading.Event()
+
+            def write():
+                added = 0
+                while not stop.is_set():
+                    theme = shared.themes[added % len(shared.themes)]
+                    shared.add_vocabulary(shared.languages[added % len(shared.languages)], theme,
+                                          [f"{theme}{added}"])
+                    added += 1
+                    stop.wait(0.001)
+            writer = threading.Thread(target=write)
+            writer.start()
+            try:
+                with ThreadPoolExecutor(count) as pool:
+                    started = time.perf_counter()
+                    list(pool.map(unseeded_task, tasks))
+                    elapsed = time.perf_counter() - started
+            finally:
+                stop.set()
+                writer.join()
+            results[f"{count}_threads_writer_us"] = elapsed / (len(tasks) * CONCURRENCY_TASK_POEMS) * 1e6
+    return results
+
+
+def compare_results(baseline: Dict[str, float], current: Dict[str, float],
+                    threshold: float = REGRESSION_THRESHOLD) -> List[Tuple[str, float, float, float, bool]]:
+    """Pair up results present in both runs as (name, baseline, current, ratio, regressed).
+
+    A result regressed when it is more than ``threshold`` slower than the baseline.
+    """
+    rows = []
+    for name in baseline:
+        if name in current:
+            before, after = baseline[name], current[name]
+            ratio = after / before if before else float("inf")
+            rows.append((name, before, after, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def _flatten(results: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+    """Prefix each suite's result names with the suite name."""
+    return {f"{suite}.{name}": value for suite, values in results.items() for name, value in values.items()}
+
+
+def _load_results(path: str) -> Dict[str, float]:
+    """Read the flat results of a JSON file written with --json."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)["results"]
+
+
+def _write_results(path: str, results: Dict[str, float], args: argparse.Namespace) -> None:
+    """Write results with enough context to tell runs apart."""
+    report = {
+        "meta": {
+            "command": args.command,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+
+def _print_results(title: str, results: Dict[str, float]) -> None:
+    """Print benchmark results as an aligned table."""
+    print(title)
+    print("=" * len(title))
+    width = max(len(name) for name in results)
+    for name, value in results.items():
+        print(f"{name:<{width}}  {value:10.3f}")
+    print()
+
+
+def _print_comparison(rows: List[Tuple[str, float, float, float, bool]], threshold: float) -> int:
+    """Print a comparison table and return the number of regressions."""
+    title = f"Comparison against baseline (regression above +{threshold:.0%})"
+    print(title)
+    print("=" * len(title))
+    width = max((len(row[0]) for row in rows), default=0)
+    for name, before, after, ratio, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<{width}}  {before:10.3f}  {after:10.3f}  {ratio - 1:+8.1%}{flag}")
+    regressions = sum(row[4] for row in rows)
+    print(f"\n{regressions} regression(s) in {len(rows)} result(s)")
+    return regressions
+
+
+def _parse_sizes(value: str) -> List[int]:
+    """Parse a comma-separated list of sizes such as ``1000,10000``."""
+    return [int(size) for size in value.split(",") if size]
+
+
+def main(argv: List[str] = None) -> None:
+    """Run MuseLingo benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description="MuseLingo benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_suite(name: str, help: str) -> argparse.ArgumentParser:
+        suite = subparsers.add_parser(name, help=help)
+        suite.add_argument("--json", type=str, metavar="OUT", help="Also write the results to this JSON file")
+        suite.add_argument("--baseline", type=str, help="Compare the results against this JSON file")
+        suite.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                           help="Relative slowdown flagged as a regression")
+        return suite
+
+    startup = add_suite("startup", "MuseLingo() startup: defaults vs JSON vs snapshot")
+    startup.add_argument("--words", type=int, default=0,
+                         help="Grow every theme to this many words before timing")
+    startup.add_argument("--repeat", type=int, default=50, help="Timed runs per case")
+    for name, help in (("generate", "generate_poem for every language and form"),
+                       ("translate", "The translated path and build_translator for every language pair")):
+        suite = add_suite(name, help)
+        suite.add_argument("--number", type=int, default=500, help="Calls per timed run")
+        suite.add_argument("--repeat", type=int, default=5, help="Timed runs per case")
+    save = add_suite("save", "save_language_data: journaled save vs full rewrite")
+    save.add_argument("--words", type=int, default=0,
+                      help="Grow every theme to this many words before timing")
+    save.add_argument("--repeat", type=int, default=5, help="Timed runs per case")
+    scaling = add_suite("scaling", "Everything above as add_vocabulary grows each theme")
+    scaling.add_argument("--sizes", type=_parse_sizes, default=list(SCALING_SIZES),
+                         help="Comma-separated words per theme to grow through")
+    scaling.add_argument("--languages", type=lambda value: value.split(","), default=["english"],
+                         help="Comma-separated languages to grow")
+    concurrency = add_suite("concurrency", "One shared instance on several threads, with and without a writer")
+    concurrency.add_argument("--threads", type=_parse_sizes, default=list(CONCURRENCY_THREADS),
+                             help="Comma-separated thread counts")
+    concurrency.add_argument("--poems", type=int, default=20000, help="Poems per thread count")
+    all_suites = add_suite("all", "Every benchmark above at its default size")
+    all_suites.add_argument("--sizes", type=_parse_sizes, default=list(ALL_SCALING_SIZES),
+                            help="Comma-separated words per theme for the scaling benchmark")
+
+    compare = subparsers.add_parser("compare", help="Compare two JSON result files")
+    compare.add_argument("baseline", type=str, help="Baseline results")
+    compare.add_argument("current", type=str, help="Results to check")
+    compare.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                         help="Relative slowdown flagged as a regression")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        rows = compare_results(_load_results(args.baseline), _load_results(args.current), args.threshold)
+        sys.exit(1 if _print_comparison(rows, args.threshold) else 0)
+
+    progress = lambda message: print(f"... {message}", file=sys.stderr)
+    suites = {}
+    if args.command in ("startup", "all"):
+        words = getattr(args, "words", 0)
+        suites["startup"] = benchmark_startup(words, getattr(args, "repeat", 50))
+        _print_results(f"Startup ({words or 'default'} words per theme, median ms)", suites["startup"])
+    if args.command in ("generate", "all"):
+        suites["generate"] = benchmark_generate(getattr(args, "number", 500), getattr(args, "repeat", 5))
+        _print_results("generate_poem (best us per poem)", suites["generate"])
+    if args.command in ("translate", "all"):
+        suites["translate"] = benchmark_translate(getattr(args, "number", 500), getattr(args, "repeat", 5))
+        _print_results("Translation (best us per call)", suites["translate"])
+    if args.command in ("save", "all"):
+        words = getattr(args, "words", 0)
+        suites["save"] = benchmark_save(words, getattr(args, "repeat", 5))
+        _print_results(f"save_language_data ({words or 'default'} words per theme, median ms)", suites["save"])
+    if args.command in ("scaling", "all"):
+        suites["scaling"] = benchmark_scaling(args.sizes, getattr(args, "languages", ["english"]),
+                                              progress=progress)
+        _print_results("Vocabulary scaling (words per theme)", suites["scaling"])
+    if args.command in ("concurrency", "all"):
+        suites["concurrency"] = benchmark_concurrency(getattr(args, "threads", CONCURRENCY_THREADS),
+                                                      getattr(args, "poems", 20000))
+        gil = "on" if getattr(sys, "_is_gil_enabled", lambda: True)() else "off"
+        _print_results(f"Concurrency (GIL {gil}, wall-clock us per poem)", suites["concurrency"])
+
+    results = _flatten(suites)
+    if args.json:
+        _write_results(args.json, results, args)
+    if args.baseline:
+        rows = compare_results(_load_results(args.baseline), results, args.threshold)
+        sys.exit(1 if _print_comparison(rows, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from muse_lingo import MuseLingo, percentile
+from muse_server import MuseServer
+
+# MuseLingo HTTP load test
+# Starts a local MuseServer on an ephemeral port (or targets --host/--port)
+# and drives it with concurrent keep-alive clients.
+# Run with: python load_test.py [--clients 64] [--requests 200] [--translate-ratio 0.2]
+
+
+async def _request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str,
+                   method: str, path: str, payload: Optional[Dict] = None) -> Tuple[int, Any]:
+    """Send one keep-alive request and read back its JSON response."""
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+def _random_payload(muse: MuseLingo, rand: random.Random, translate_ratio: float) -> Tuple[str, Dict]:
+    """Pick a random generate or translate request."""
+    language = rand.choice(muse.languages)
+    if rand.random() < translate_ratio:
+        target = rand.choice([lang for lang in muse.languages if lang != language])
+        lines = muse.generate_poem(language, rand.choice(muse.themes), rand.choice(muse.emotions),
+                                   "free_verse", 4, rng=rand)
+        return "/translate", {"source": language, "target": target, "lines": lines}
+    payload = {"language": language, "theme": rand.choice(muse.themes),
+               "emotion": rand.choice(muse.emotions), "form": rand.choice(muse.poetry_forms)}
+    if rand.random() < translate_ratio:
+        payload["translate"] = rand.choice([lang for lang in muse.languages if lang != language])
+    return "/generate", payload
+
+
+async def _client(host: str, port: int, payloads: List[Tuple[str, Dict]], latencies: List[float]) -> int:
+    """Send ``payloads`` over one connection, returning the number of failures."""
+    reader, writer = await asyncio.open_connection(host, port)
+    failures = 0
+    try:
+        for path, payload in payloads:
+            started = time.perf_counter()
+            status, _ = await _request(reader, writer, host, "POST", path, payload)
+            latencies.append(time.perf_counter() - started)
+            failures += status != 200
+    finally:
+        writer.close()
+    return failures
+
+
+async def run_load_test(clients: int = 64, requests: int = 200, translate_ratio: float = 0.2,
+                        host: Optional[str] = None, port: Optional[int] = None, max_batch: int = 64,
+                        latency_budget: float = 0.002, seed: int = 0, pool_size: int = 0) -> Dict[str, Any]:
+    """Drive a MuseLingo server with ``clients`` concurrent connections.
+
+    Each client sends ``requests`` requests back to back. Without ``host``,
+    a local server is started on an ephemeral port for the duration of the run.
+    """
+    server = None
+    if host is None:
+        server = MuseServer(max_batch=max_batch, latency_budget=latency_budget, seed=seed, pool_size=pool_size)
+        host, port = await server.start("127.0.0.1", 0)
+    try:
+        muse = server.muse if server else MuseLingo()
+        rand = random.Random(seed)
+        plans = [[_random_payload(muse, rand, translate_ratio) for _ in range(requests)] for _ in range(clients)]
+        latencies: List[float] = []
+        started = time.perf_counter()
+        failures = await asyncio.gather(*(_client(host, port, plan, latencies) for plan in plans))
+        elapsed = time.perf_counter() - started
+
+        reader, writer = await asyncio.open_connection(host, port)
+        _, server_stats = await _request(reader, writer, host, "GET", "/stats")
+        writer.close()
+    finally:
+        if server:
+            await server.stop()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "failures": sum(failures),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "server": server_stats,
+    }
+
+
+def main():
+    """Run the load test from the command line."""
+    parser = argparse.ArgumentParser(description="MuseLingo HTTP load test")
+    parser.add_argument("--clients", "-c", type=int, default=64, help="Concurrent connections")
+    parser.add_argument("--requests", "-n", type=int, default=200, help="Requests per connection")
+    parser.add_argument("--translate-ratio", type=float, default=0.2,
+                        help="Share of translate requests, and of generate requests asking for a translation")
+    parser.add_argument("--host", type=str, help="Target an already running server instead of a local one")
+    parser.add_argument("--port", "-p", type=int, default=8080, help="Port of the running server")
+    parser.add_argument("--batch-size", type=int, default=64, help="Largest micro-batch of the local server")
+    parser.add_argument("--latency-budget-ms", type=float, default=2.0, help="Latency budget of the local server")
+    parser.add_argument("--pool-size", type=int, default=0, help="Pre-generation pool size of the local server")
+    parser.add_argument("--seed", "-s", type=int, default=0, help="Seed for the request mix")
+    parser.add_argument("--json", action="store_true", help="Print the full results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_load_test(args.clients, args.requests, args.translate_ratio,
+                                        args.host, args.port if args.host else None, args.batch_size,
+                                        args.latency_budget_ms / 1000, args.seed, args.pool_size))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{results['requests']} requests from {args.clients} clients in {results['elapsed_s']:.2f}s "
+          f"({results['failures']} failed)")
+    print(f"Throughput: {results['throughput_rps']:.0f} req/s")
+    print(f"Client latency: p50 {results['p50_ms']:.2f} ms, p99 {results['p99_ms']:.2f} ms")
+    for path, stats in results["server"]["endpoints"].items():
+        print(f"Server {path}: p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms, "
+              f"{stats['count']} requests")
+    for name, batching in results["server"]["batching"].items():
+        print(f"Batching {name}: {batching['batches']} batches, mean size {batching['mean_batch_size']:.1f}")
+    pool = results["server"].get("pool")
+    if pool:
+        print(f"Pool: hit rate {pool['hit_rate']:.1%}, {pool['refills']} refills, "
+              f"refill lag p99 {pool['refill_lag_p99_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,155 @@
 import random
 import json
 import os
+import re
+import sys
+import time
 import argparse
-from typing import Dict, List, Tuple, Optional
+import bisect
+import collections
+import contextlib
+import contextvars
+import hashlib
+import itertools
+import functools
+import math
+import mmap
+import multiprocessing
+import operator
+import struct
+import threading
+import unicodedata
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Set, TextIO, Tuple
 
 # MuseLingo: A Multilingual Poetry Generator
 # This application generates poetry in multiple languages based on themes and emotions
 # It can also translate poetry between languages while attempting to preserve poetic qualities
 
 class MuseLingo:
-    def __init__(self, data_path: str = "poetry_data.json"):
-        """Initialize the MuseLingo poetry generator with language data."""
+    def __init__(self, data_path: str = "poetry_data.json", metrics: Optional["Metrics"] = None,
+                 concurrent: bool = False):
+        """Initialize the MuseLingo poetry generator with language data.
+
+        Pass a Metrics instance as ``metrics`` to instrument loading and
+        generation; it can also be attached or removed later through the
+        ``metrics`` attribute.
+
+        An instance can be shared by threads: generation reads immutable
+        compiled plans, and add_vocabulary publishes new ones atomically.
+        With ``concurrent``, calls without an ``rng`` draw from a private
+        generator per thread instead of the shared ``random`` module; pass
+        ``stream_rng(seed, task)`` for reproducible per-task streams.
+        """
         self.languages = ["english", "spanish", "french", "japanese", "arabic"]
         self.themes = ["love", "nature", "time", "freedom", "sorrow", "hope"]
         self.emotions = ["joy", "melancholy", "wonder", "longing", "serenity"]
         self.poetry_forms = ["haiku", "sonnet", "free_verse", "quatrain", "tanka"]
         
-        # Load language data if file exists, otherwise create default data
-        if os.path.exists(data_path):
-            with open(data_path, 'r', encoding='utf-8') as f:
-                self.language_data = json.load(f)
+        # Prefer the precompiled snapshot unless the JSON file was edited after
+        # it, then the JSON file, otherwise the built-in default data. Nothing
+        # is written to disk here; save_language_data does that.
+        self.data_path = data_path
+        self.vocabulary = VocabularyStore()
+        # Vocabulary changes not yet saved, and the data file whose JSON or
+        # snapshot plus journal matches everything else (see save_language_data)
+        self._unsaved: List[Dict] = []
+        self._journal_base: Optional[str] = None
+        self._journal_lock = threading.Lock()
+        self._compaction: Optional[threading.Thread] = None
+        # Held for every read of the vocabulary store and every cache rebuild,
+        # never by a generation that hits its compiled plan nor during disk
+        # writes; a thread needing both takes _journal_lock first
+        self._lock = threading.RLock()
+        self._rng_source = _ThreadRandom() if concurrent else random
+        self._change_listeners: List[Callable[[Optional[str], Optional[str]], None]] = []
+        # Hooks record into _recorder: the attached Metrics, or while profile()
+        # blocks are open, a _ProfileRecorder that also feeds them
+        self._profiles = 0
+        self.metrics = metrics
+        if metrics is None:
+            self._load_language_data(data_path)
         else:
-            self.language_data = self._create_default_data()
-            with open(data_path, 'w', encoding='utf-8') as f:
-                json.dump(self.language_data, f, ensure_ascii=False, indent=2)
+            started = time.perf_counter()
+            self._load_language_data(data_path)
+            metrics.observe("load", time.perf_counter() - started)
+        
+        # Compiled generation plans per (language, theme, emotion, form), a
+        # bounded dict that hits only read, the word pools they share per
+        # (language, theme, emotion), a bounded LRU, and compiled translators
+        # per language pair. add_vocabulary publishes copies without the
+        # entries a change affects.
+        self._plans: Dict[Tuple[str, str, str, str], GenerationPlan] = {}
+        self._pool_cache: "collections.OrderedDict[Tuple[str, str, str], WordPools]" = collections.OrderedDict()
+        self._translators: Dict[Tuple[str, str], Translator] = {}
+        # Rhyme classes per language, built on first use and extended in place
+        self._rhyme_indexes: Dict[str, RhymeIndex] = {}
+        # Concept poem plans per (source, theme, emotion, form), bounded like
+        # _plans, and render tables per (language, theme, emotion)
+        self._concept_plans: Dict[Tuple[str, str, str, str], GenerationPlan] = {}
+        self._concept_renderers: Dict[Tuple[str, str, str], Callable[[str], str]] = {}
     
+    def _load_language_data(self, data_path: str) -> None:
+        """Load the snapshot, the JSON file or the defaults, then replay the journal."""
+        if self._load_base_data(data_path):
+            self._journal_base = os.path.abspath(data_path)
+        # Replay is idempotent: add skips words a category already holds
+        for record in read_journal(journal_path_for(data_path)):
+            key = (record["language"], record["section"], record["name"])
+            weights = record.get("weights")
+            self.vocabulary.add(*key, record["words"], weights)
+            if weights is not None:
+                self.vocabulary.set_weights(*key, record["words"], weights)
+
+    def _load_base_data(self, data_path: str) -> bool:
+        """Load the snapshot, the JSON file or the defaults; return False for the defaults."""
+        snapshot_path = snapshot_path_for(data_path)
+        json_exists = os.path.exists(data_path)
+        if os.path.exists(snapshot_path) and (
+                not json_exists or os.path.getmtime(snapshot_path) >= os.path.getmtime(data_path)):
+            try:
+                snapshot = LanguageSnapshot(snapshot_path)
+            except (OSError, ValueError):
+                pass  # Unreadable snapshot: fall back to the JSON file or defaults
+            else:
+                for language in snapshot.languages():
+                    loader = functools.partial(snapshot.load, language)
+                    if self._recorder is not None:
+                        loader = functools.partial(_timed, self._recorder, "load_language", loader)
+                    self.vocabulary.attach(language, loader)
+                return True
+        if json_exists:
+            with open(data_path, 'r', encoding='utf-8') as f:
+                self.language_data = json.load(f)
+            return True
+        self.language_data = self._create_default_data()
+        return False
+
+    @property
+    def language_data(self) -> "VocabularyView":
+        """Read-only view of the vocabulary in the original nested dict layout."""
+        return VocabularyView(self.vocabulary)
+
+    @language_data.setter
+    def language_data(self, data: Mapping[str, Dict]) -> None:
+        """Replace all language data with a nested dict in the JSON file layout."""
+        vocabulary = VocabularyStore()
+        for language, language_data in data.items():
+            vocabulary.load(language, language_data)
+        with self._lock:
+            self.vocabulary = vocabulary
+            self._plans = {}
+            self._pool_cache = collections.OrderedDict()
+            self._translators = {}
+            self._rhyme_indexes = {}
+            self._concept_plans = {}
+            self._concept_renderers = {}
+            # The next save has to write everything, not just a journal entry
+            self._unsaved = []
+            self._journal_base = None
+            for listener in self._change_listeners:
+                listener(None, None)
+
     def _create_default_data(self) -> Dict:
         """Create default language data structures if no data file is found."""
         data = {}
@@ -172,8 +297,242 @@ class MuseLingo:
         return data
 
     def generate_poem(self, language: str, theme: str, emotion: str, form: str, 
-                     lines: int = 6, translator: Optional[Dict] = None) -> List[str]:
-        """Generate a poem in the specified language, theme, emotion, and form."""
+                     lines: int = 6, translator: Optional[Dict] = None,
+                     rng: Optional[random.Random] = None) -> List[str]:
+        """Generate a poem in the specified language, theme, emotion, and form.
+
+        Pass a seeded ``random.Random`` as ``rng`` for reproducible output;
+        otherwise the global ``random`` module is used, or a per-thread
+        generator on a ``concurrent`` instance.
+        """
+        if self._recorder is not None:
+            return self._generate_poem_measured(language, theme, emotion, form, lines, translator, rng)
+        plan = self._plan(language, theme, emotion, form)
+        poem = plan.compose(plan.pools, lines, (rng or self._rng_source).random)
+        
+        # Translate if a translator is provided
+        if translator:
+            return list(_iter_translated(poem, translator))
+        
+        return poem
+
+    def _generate_poem_measured(self, language: str, theme: str, emotion: str, form: str, lines: int,
+                                translator: Optional[Dict], rng: Optional[random.Random]) -> List[str]:
+        """generate_poem with every stage timed into the metrics recorder."""
+        metrics = self._recorder
+        clock = time.perf_counter
+        started = clock()
+        hit = (language, theme, emotion, form) in self._plans
+        plan = self._plan(language, theme, emotion, form)
+        planned = clock()
+        metrics.count("plan_cache", (("result", "hit" if hit else "miss"),))
+        poem = plan.compose(plan.pools, lines, (rng or self._rng_source).random)
+        composed = clock()
+        metrics.observe("plan", planned - started)
+        metrics.observe("compose", composed - planned)
+        metrics.count("poems", (("language", language), ("form", form)))
+        if translator:
+            poem = self._measured_translation(poem, translator, language)
+        metrics.observe("generate", clock() - started)
+        return poem
+
+    def _measured_translation(self, poem: List[str], translator: Mapping[str, str], language: str) -> List[str]:
+        """Translate a poem, timing it and counting its language pair into the metrics recorder."""
+        started = time.perf_counter()
+        poem = list(_iter_translated(poem, translator))
+        self._recorder.observe("translate", time.perf_counter() - started)
+        target = getattr(translator, "target", "custom")
+        self._recorder.count("translations", (("source", language), ("target", target)))
+        return poem
+
+    @property
+    def metrics(self) -> Optional["Metrics"]:
+        """The Metrics every call records into, or None when instrumentation is off."""
+        return self._metrics
+
+    @metrics.setter
+    def metrics(self, metrics: Optional["Metrics"]) -> None:
+        with self._lock:
+            self._metrics = metrics
+            self._update_recorder()
+
+    def profile(self) -> "contextlib.AbstractContextManager[Metrics]":
+        """Collect the metrics of the calls made inside a ``with`` block.
+
+        Yields a fresh Metrics that only sees calls made from the same thread
+        or asyncio task inside the block, for example a single request, even
+        on a shared instance. Those calls are recorded into the attached
+        metrics, if any, as well.
+        """
+        return _profile(self)
+
+    def _update_recorder(self) -> None:
+        """Point the hooks at the attached metrics, or at a profiling recorder; call with the lock held."""
+        self._recorder = _ProfileRecorder(self, self._metrics) if self._profiles else self._metrics
+
+    def generate_poems_batch(self, specs: Iterable[Sequence], seed: Optional[int] = None,
+                             translator: Optional[Dict] = None) -> List[List[str]]:
+        """Generate many poems from (language, theme, emotion, form[, lines]) specs.
+
+        Each distinct spec is validated and resolved to its word pools once,
+        and all random draws come from a single ``random.Random(seed)``. The
+        result is identical to calling ``generate_poem`` for every spec in
+        order with ``rng=random.Random(seed)``.
+        """
+        return list(self.iter_poems(specs, seed, translator))
+
+    def iter_poem(self, language: str, theme: str, emotion: str, form: str,
+                  lines: int = 6, translator: Optional[Dict] = None,
+                  rng: Optional[random.Random] = None) -> Iterator[str]:
+        """Lazily yield the lines of a poem as they are generated.
+
+        Yields the same lines as ``generate_poem`` with the same arguments and
+        RNG state, but never holds the whole poem, so memory stays constant
+        for any ``lines``. The request is validated before the first line.
+        """
+        pools = self._plan(language, theme, emotion, form).pools
+        if self._recorder is not None:
+            # Lines are composed lazily, so only the request itself is counted
+            self._recorder.count("poems", (("language", language), ("form", form)))
+        poem = _iter_from_pools(pools, form, lines, (rng or self._rng_source).random)
+        if translator:
+            return _iter_translated(poem, translator)
+        return poem
+
+    def iter_poems(self, specs: Iterable[Sequence], seed: Optional[int] = None,
+                   translator: Optional[Dict] = None) -> Iterator[List[str]]:
+        """Lazily yield whole poems for a stream of specs, one per spec.
+
+        The streaming counterpart of ``generate_poems_batch``: specs are
+        consumed and validated only as poems are requested, and the output
+        matches the batch call for the same specs and seed.
+        """
+        rand = random.Random(seed).random
+        resolved = {}
+        metrics = self._recorder
+        for spec in specs:
+            spec = tuple(spec)
+            request = resolved.get(spec)
+            if request is None:
+                plan = self._plan(*spec[:4])
+                request = resolved[spec] = (plan.compose, plan.pools, spec[4] if len(spec) > 4 else 6)
+            compose, pools, lines = request
+            if metrics is None:
+                poem = compose(pools, lines, rand)
+                if translator:
+                    poem = list(_iter_translated(poem, translator))
+            else:
+                started = time.perf_counter()
+                poem = compose(pools, lines, rand)
+                metrics.observe("compose", time.perf_counter() - started)
+                metrics.count("poems", (("language", spec[0]), ("form", spec[3])))
+                if translator:
+                    poem = self._measured_translation(poem, translator, spec[0])
+            yield poem
+
+    def iter_unique_poems(self, language: str, theme: str, emotion: str, form: str, lines: int = 6,
+                          seed: Optional[int] = None, seen: Optional["FingerprintSet"] = None,
+                          max_misses: Optional[int] = None) -> Iterator[List[str]]:
+        """Lazily yield poems for one combination, never the same poem twice.
+
+        Poems are remembered as 64-bit fingerprints in ``seen``, a new
+        FingerprintSet by default; pass a BloomFilter to bound memory up front.
+        The stream ends once ``estimate_poem_space`` poems have been produced
+        or after ``max_misses`` (default UNIQUE_MAX_MISSES) duplicates in a row,
+        so a small space is never spun on. The request is validated before
+        the first poem.
+        """
+        plan = self._plan(language, theme, emotion, form)
+        return _iter_unique(plan.compose, plan.pools, lines, random.Random(seed).random,
+                            FingerprintSet() if seen is None else seen, _poem_space(plan.pools, form, lines),
+                            UNIQUE_MAX_MISSES if max_misses is None else max_misses)
+
+    def estimate_poem_space(self, language: str, theme: str, emotion: str, form: str, lines: int = 6) -> int:
+        """Estimate how many distinct poems a combination can produce.
+
+        Multiplies the number of distinct outputs of each line, so the result
+        is an upper bound: different word choices occasionally spell the same
+        line, most often when a word is both a theme and an emotion word.
+        Words whose weight is zero are never drawn and are not counted.
+        """
+        return _poem_space(self._plan(language, theme, emotion, form).pools, form, lines)
+
+    def _plan(self, language: str, theme: str, emotion: str, form: str) -> "GenerationPlan":
+        """Return the compiled plan for a request, validating and building it on a miss.
+
+        A hit skips validation and every lookup the plan was built from, and
+        is a single dict read: no lock and no write to shared state. At most
+        MAX_CACHED_PLANS plans are kept; a miss past that evicts the oldest
+        plan, since hits do not track recency. Weighted categories are swapped for alias-table backed
+        WeightedWords in the plan's pools.
+        """
+        key = (language, theme, emotion, form)
+        plan = self._plans.get(key)
+        if plan is not None:
+            return plan
+        with self._lock:
+            return self._build_plan(key)
+
+    def _build_plan(self, key: Tuple[str, str, str, str]) -> "GenerationPlan":
+        """Compile and cache the plan for a request; called with the lock held."""
+        plans = self._plans
+        plan = plans.get(key)
+        if plan is not None:
+            return plan  # Built by another thread while this one waited
+        language, theme, emotion, form = key
+        metrics = self._recorder
+        if metrics is None:
+            self.validate_request(language, theme, emotion, form)
+            pools = self._word_pools(language, theme, emotion, form)
+        else:
+            started = time.perf_counter()
+            self.validate_request(language, theme, emotion, form)
+            validated = time.perf_counter()
+            hit = (language, theme, emotion) in self._pool_cache
+            pools = self._word_pools(language, theme, emotion, form)
+            metrics.observe("validate", validated - started)
+            metrics.observe("pools", time.perf_counter() - validated)
+            metrics.count("pool_cache", (("result", "hit" if hit else "miss"),))
+        pools = self._weighted_pools(pools, language, theme, emotion, form)
+        plan = plans[key] = GenerationPlan(FORM_COMPOSERS[form], pools)
+        if len(plans) > MAX_CACHED_PLANS:
+            del plans[next(iter(plans))]  # The oldest plan; hits never reorder
+        return plan
+
+    def _weighted_pools(self, pools: "WordPools", language: str, theme: str, emotion: str,
+                        form: str) -> "WordPools":
+        """Return ``pools`` with its weighted theme and emotion words sampled through alias tables.
+
+        Rhyme endings stay uniform within their rhyme class.
+        """
+        vocabulary = self.vocabulary
+        theme_table = vocabulary.alias_table(language, "words", theme)
+        emotion_table = vocabulary.alias_table(language, "emotions", emotion)
+        if theme_table is None and emotion_table is None:
+            return pools
+        weighted = {}
+        if theme_table is not None:
+            weighted["theme_words"] = WeightedWords(pools.theme_words, theme_table)
+            weighted["capitalized_theme"] = WeightedWords(pools.capitalized_theme, theme_table)
+        if emotion_table is not None:
+            weighted["emotion_words"] = WeightedWords(pools.emotion_words, emotion_table)
+            weighted["capitalized_emotion"] = WeightedWords(pools.capitalized_emotion, emotion_table)
+        if form in SYLLABIC_FORMS:
+            weighted["meter"] = _build_meter(
+                pools,
+                vocabulary.syllable_counts(language, "words", theme),
+                vocabulary.syllable_counts(language, "emotions", emotion),
+                vocabulary.syllable_counts(language, "connectors"),
+                vocabulary.weights(language, "words", theme),
+                vocabulary.weights(language, "emotions", emotion))
+        return pools._replace(**weighted)
+
+    def validate_request(self, language: str, theme: str, emotion: str, form: str) -> None:
+        """Raise ValueError if any part of a generation request is unsupported.
+
+        Nothing is compiled, so this is cheap enough to check a request with
+        before queueing it.
+        """
         if language not in self.languages:
             raise ValueError(f"Language '{language}' not supported. Choose from: {', '.join(self.languages)}")
         if theme not in self.themes:
@@ -182,128 +541,217 @@ class MuseLingo:
             raise ValueError(f"Emotion '{emotion}' not supported. Choose from: {', '.join(self.emotions)}")
         if form not in self.poetry_forms:
             raise ValueError(f"Form '{form}' not supported. Choose from: {', '.join(self.poetry_forms)}")
-        
-        language_data = self.language_data[language]
-        
-        # Select words based on theme and emotion
-        theme_words = language_data["words"][theme]
-        emotion_words = language_data["emotions"][emotion]
-        connectors = language_data["connectors"]
-        starters = language_data["line_starters"]
-        
-        poem = []
-        
-        # Adjust generation strategy based on form
-        if form == "haiku":
-            poem = self._generate_haiku(language, theme_words, emotion_words)
-        elif form == "tanka":
-            poem = self._generate_tanka(language, theme_words, emotion_words)
+
+    def _word_pools(self, language: str, theme: str, emotion: str,
+                    form: Optional[str] = None) -> "WordPools":
+        """Return the cached word pools a validated request draws from; call with the lock held.
+
+        The syllable meter and rhyme table are built on first use by a form
+        that needs them.
+        """
+        key = (language, theme, emotion)
+        pool_cache = self._pool_cache
+        pools = pool_cache.get(key)
+        if pools is not None:
+            pool_cache.move_to_end(key)
         else:
-            # Generic poem generation for other forms
-            for i in range(lines):
-                if i == 0 or random.random() < 0.3:  # 30% chance to start with a line starter
-                    line = random.choice(starters)
-                    
-                    # Add theme or emotion word
-                    if random.random() < 0.5:
-                        line += " " + random.choice(theme_words)
-                    else:
-                        line += " " + random.choice(emotion_words)
-                    
-                    # Add a connector sometimes
-                    if random.random() < 0.3:
-                        line += " " + random.choice(connectors)
-                    
-                    # Add another word
-                    if random.random() < 0.5:
-                        line += " " + random.choice(theme_words)
-                    else:
-                        line += " " + random.choice(emotion_words)
-                else:
-                    # More varied line construction
-                    if random.random() < 0.5:
-                        line = random.choice(theme_words) + " " + random.choice(connectors) + " " + random.choice(emotion_words)
-                    else:
-                        line = random.choice(emotion_words) + " " + random.choice(theme_words)
-                
-                # Capitalize first letter and add punctuation occasionally
-                line = line[0].upper() + line[1:]
-                if random.random() < 0.3 and i < lines - 1:
-                    line += random.choice([",", "...", ";", "—"])
-                elif i == lines - 1:
-                    line += random.choice([".", "...", "!"])
-                
-                poem.append(line)
-        
-        # Translate if a translator is provided
-        if translator:
-            translated_poem = []
-            for line in poem:
-                translated_line = ""
-                words = line.split()
-                for word in words:
-                    # Strip punctuation for translation
-                    punctuation = ""
-                    if word[-1] in ",.;!?—":
-                        punctuation = word[-1]
-                        word = word[:-1]
-                    
-                    # Try to translate the word
-                    if word.lower() in translator:
-                        translated_word = translator[word.lower()]
-                        # Preserve capitalization
-                        if word[0].isupper():
-                            translated_word = translated_word[0].upper() + translated_word[1:]
-                        translated_line += translated_word + punctuation + " "
-                    else:
-                        translated_line += word + punctuation + " "
-                
-                translated_poem.append(translated_line.strip())
-            return translated_poem
-        
-        return poem
+            vocabulary = self.vocabulary
+            theme_words = vocabulary.words(language, "words", theme)
+            emotion_words = vocabulary.words(language, "emotions", emotion)
+            pools = self._pool_cache[key] = WordPools(
+                theme_words, emotion_words,
+                vocabulary.words(language, "connectors"),
+                tuple(_capitalize(word) for word in vocabulary.words(language, "line_starters")),
+                tuple(_capitalize(word) for word in theme_words),
+                tuple(_capitalize(word) for word in emotion_words))
+            if len(pool_cache) > MAX_CACHED_PLANS:
+                pool_cache.popitem(last=False)
+        if pools.rhymes is None and form in RHYMED_FORMS:
+            pools = self._pool_cache[key] = pools._replace(
+                rhymes=self._rhyme_index(language).table(theme, emotion))
+        if pools.meter is None and form in SYLLABIC_FORMS:
+            vocabulary = self.vocabulary
+            pools = self._pool_cache[key] = pools._replace(meter=_build_meter(
+                pools,
+                vocabulary.syllable_counts(language, "words", theme),
+                vocabulary.syllable_counts(language, "emotions", emotion),
+                vocabulary.syllable_counts(language, "connectors")))
+        return pools
 
-    def _generate_haiku(self, language: str, theme_words: List[str], emotion_words: List[str]) -> List[str]:
-        """Generate a haiku poem (5-7-5 syllable pattern)."""
-        # This is a simplified approach - for a real implementation,
-        # we would need syllable counting specific to each language
-        haiku = []
-        
-        # First line (5 syllables)
-        haiku.append(random.choice(theme_words).capitalize())
-        
-        # Second line (7 syllables)
-        second_line = random.choice(emotion_words) + " " + random.choice(theme_words)
-        haiku.append(second_line)
-        
-        # Third line (5 syllables)
-        haiku.append(random.choice(emotion_words))
-        
-        return haiku
+    def generate_concept_poem(self, theme: str, emotion: str, form: str, lines: int = 6,
+                              rng: Optional[random.Random] = None, source: str = "english") -> "ConceptPoem":
+        """Generate a language-neutral poem that render_poem turns into any language.
 
-    def _generate_tanka(self, language: str, theme_words: List[str], emotion_words: List[str]) -> List[str]:
-        """Generate a tanka poem (5-7-5-7-7 syllable pattern)."""
-        # Start with a haiku
-        tanka = self._generate_haiku(language, theme_words, emotion_words)
-        
-        # Add two more lines (7 syllables each)
-        connectors = self.language_data[language]["connectors"]
-        
-        # Fourth line
-        fourth_line = random.choice(emotion_words) + " " + random.choice(connectors) + " " + random.choice(theme_words)
-        tanka.append(fourth_line)
-        
-        # Fifth line
-        fifth_line = random.choice(theme_words) + " " + random.choice(emotion_words)
-        tanka.append(fifth_line)
-        
-        return tanka
+        Words are drawn uniformly from the vocabulary positions every language
+        has, so each one renders in all of them. Syllables and rhymes follow
+        ``source``, as they would for a poem translated from it.
+        """
+        plan = self._concept_plan(source, theme, emotion, form)
+        return ConceptPoem(theme, emotion, source, tuple(plan.compose(plan.pools, lines, (rng or self._rng_source).random)))
+
+    def render_poem(self, poem: "ConceptPoem", languages: Optional[Iterable[str]] = None) -> Dict[str, List[str]]:
+        """Render a concept poem into each of ``languages`` (default: all of them).
+
+        While every concept of the theme and emotion is a single code point,
+        each line is one ``str.translate`` per language and nothing is
+        tokenized or looked up word by word.
+        """
+        if languages is None:
+            languages = self.languages
+        renderers = []
+        for language in languages:
+            if language not in self.languages:
+                raise ValueError(f"Language '{language}' not supported. Choose from: {', '.join(self.languages)}")
+            renderers.append((language, self._concept_renderer(language, poem.theme, poem.emotion)))
+        if self._recorder is None:
+            return {language: list(map(render, poem.lines)) for language, render in renderers}
+        started = time.perf_counter()
+        rendered = {language: list(map(render, poem.lines)) for language, render in renderers}
+        self._recorder.observe("render", time.perf_counter() - started)
+        self._recorder.count("renders", (("languages", str(len(renderers))),))
+        return rendered
+
+    def generate_multilingual_poem(self, theme: str, emotion: str, form: str, lines: int = 6,
+                                   rng: Optional[random.Random] = None, languages: Optional[Iterable[str]] = None,
+                                   source: str = "english") -> Dict[str, List[str]]:
+        """Generate one poem and render it into each of ``languages`` (default: all of them)."""
+        return self.render_poem(self.generate_concept_poem(theme, emotion, form, lines, rng, source), languages)
+
+    def _concept_plan(self, source: str, theme: str, emotion: str, form: str) -> "GenerationPlan":
+        """Return the compiled plan for a concept poem, validating and building it on a miss."""
+        key = (source, theme, emotion, form)
+        plan = self._concept_plans.get(key)
+        if plan is not None:
+            return plan
+        self.validate_request(source, theme, emotion, form)
+        with self._lock:
+            plans = self._concept_plans
+            plan = plans.get(key)
+            if plan is None:
+                plan = plans[key] = GenerationPlan(FORM_COMPOSERS[form],
+                                                   self._concept_pools(source, theme, emotion, form))
+                if len(plans) > MAX_CACHED_PLANS:
+                    del plans[next(iter(plans))]
+        return plan
+
+    def _concept_categories(self, theme: str, emotion: str) -> List[Tuple[str, str, int]]:
+        """List the (section, name, shared length) of each category a concept poem draws from.
 
-    def build_translator(self, source_lang: str, target_lang: str) -> Dict:
-        """Build a simple word-to-word translator between two languages."""
+        Concepts are numbered in this order, and within a category by position.
+        """
+        categories = []
+        for section, name in (("words", theme), ("emotions", emotion), ("connectors", ""), ("line_starters", "")):
+            shared = min(len(self.vocabulary.ids(language, section, name)) for language in self.languages)
+            if not shared:
+                raise ValueError(f"Not every language has {name or section} words")
+            categories.append((section, name, shared))
+        return categories
+
+    def _concept_pools(self, source: str, theme: str, emotion: str, form: str) -> "WordPools":
+        """Build word pools of concept codes, with the meter and rhymes of ``source``."""
+        categories = self._concept_categories(theme, emotion)
+        codes = []
+        offset = 0
+        for _, _, shared in categories:
+            codes.append(tuple(_concept_code(concept) for concept in range(offset, offset + shared)))
+            offset += shared
+        theme_codes, emotion_codes, connector_codes, starter_codes = codes
+        pools = WordPools(theme_codes, emotion_codes, connector_codes,
+                          tuple(map(_capitalize_concept, starter_codes)),
+                          tuple(map(_capitalize_concept, theme_codes)),
+                          tuple(map(_capitalize_concept, emotion_codes)))
+        vocabulary = self.vocabulary
+        if form in RHYMED_FORMS:
+            # Rhyme classes hold words; a word both a theme and an emotion word
+            # rhymes as its theme concept
+            code_of = {}
+            for (section, name, shared), group in zip(categories, codes[:2]):
+                for word, code in zip(vocabulary.words(source, section, name), group):
+                    code_of.setdefault(word, code)
+            rhymes = self._rhyme_index(source).table(theme, emotion)
+            classes = (tuple(code_of[word] for word in words if word in code_of) for words in rhymes.classes)
+            pools = pools._replace(rhymes=RhymeTable(
+                tuple(words for words in classes if len(words) > 1),
+                tuple(code_of[word] for word in rhymes.words if word in code_of)))
+        if form in SYLLABIC_FORMS:
+            counts = [vocabulary.syllable_counts(source, section, name)[:shared]
+                      for section, name, shared in categories[:3]]
+            pools = pools._replace(meter=_build_meter(pools, *counts, capitalize=_capitalize_concept))
+        return pools
+
+    def _concept_renderer(self, language: str, theme: str, emotion: str) -> Callable[[str], str]:
+        """Return the function that renders a line of concept codes as ``language`` words.
+
+        It is a ``str.translate`` while every concept fits in one code point,
+        and a substitution of whole concept spellings otherwise.
+        """
+        key = (language, theme, emotion)
+        render = self._concept_renderers.get(key)
+        if render is not None:
+            return render
+        with self._lock:
+            table = {}
+            concept = 0
+            for section, name, shared in self._concept_categories(theme, emotion):
+                for word in self.vocabulary.words(language, section, name)[:shared]:
+                    code = _concept_code(concept)
+                    table[code] = word
+                    table[_capitalize_concept(code)] = _capitalize(word)
+                    concept += 1
+            if concept <= CONCEPT_DIGITS:
+                render = operator.methodcaller("translate", {ord(code): word for code, word in table.items()})
+            else:
+                render = functools.partial(_CONCEPT_TOKEN.sub, lambda match: table[match.group()])
+            self._concept_renderers[key] = render
+        return render
+
+    def build_translator(self, source_lang: str, target_lang: str) -> "Translator":
+        """Return the compiled translator between two languages.
+
+        Each language pair is compiled once and cached until add_vocabulary
+        changes one of its languages.
+        """
         if source_lang not in self.languages or target_lang not in self.languages:
             raise ValueError(f"Both languages must be one of: {', '.join(self.languages)}")
         
+        key = (source_lang, target_lang)
+        translator = self._translators.get(key)
+        metrics = self._recorder
+        if metrics is not None:
+            metrics.count("translator_cache", (("result", "miss" if translator is None else "hit"),))
+        if translator is None:
+            started = time.perf_counter()
+            with self._lock:
+                translator = self._translators[key] = Translator(
+                    self._build_word_map(source_lang, target_lang), source_lang, target_lang)
+            if metrics is not None:
+                metrics.observe("build_translator", time.perf_counter() - started)
+        return translator
+
+    def compile_translators(self) -> None:
+        """Compile translators for every language pair ahead of time."""
+        for source_lang in self.languages:
+            for target_lang in self.languages:
+                if source_lang != target_lang:
+                    self.build_translator(source_lang, target_lang)
+
+    def translator_count(self) -> int:
+        """Return how many compiled translators are cached."""
+        return len(self._translators)
+
+    def clear_translators(self) -> None:
+        """Drop every compiled translator, so the next build_translator compiles afresh."""
+        with self._lock:
+            self._translators = {}
+
+    def translate_poem(self, poem: List[str], translator: Dict) -> List[str]:
+        """Translate poem lines word by word with a translator, e.g. from build_translator."""
+        if self._recorder is not None:
+            return self._measured_translation(poem, translator, getattr(translator, "source", "custom"))
+        return list(_iter_translated(poem, translator))
+
+    def _build_word_map(self, source_lang: str, target_lang: str) -> Dict[str, str]:
+        """Build the word-to-word map between two languages by aligning positions."""
         translator = {}
         source_data = self.language_data[source_lang]
         target_data = self.language_data[target_lang]
@@ -340,19 +788,183 @@ class MuseLingo:
             
         return translator
 
-    def add_vocabulary(self, language: str, theme: str, words: List[str]) -> None:
-        """Add new vocabulary words to a language theme."""
+    def add_vocabulary(self, language: str, theme: str, words: List[str],
+                       weights: Optional[List[float]] = None) -> None:
+        """Add new vocabulary words to a language theme, skipping words it already has.
+
+        ``weights`` gives each word a relative sampling frequency, also for
+        words the theme already has. A theme with weights is sampled in
+        proportion to them, and words without one weigh 1.0.
+        """
         if language not in self.languages:
             raise ValueError(f"Language '{language}' not supported")
         if theme not in self.themes:
             raise ValueError(f"Theme '{theme}' not supported")
+        if weights is not None:
+            words = list(words)
+            weights = [float(weight) for weight in weights]
+            if len(weights) != len(words):
+                raise ValueError(f"Expected {len(words)} weights, got {len(weights)}")
+            if not all(weight >= 0 and math.isfinite(weight) for weight in weights):
+                raise ValueError("Weights must be finite and non-negative")
         
-        self.language_data[language]["words"][theme].extend(words)
+        with self._lock:
+            vocabulary = self.vocabulary
+            if weights is not None:
+                total = vocabulary.weight_total(language, "words", theme, words, weights)
+                if not total > 0 or not math.isfinite(total):
+                    raise ValueError(f"Weights would leave theme '{theme}' without a positive, finite total")
+            added = vocabulary.add(language, "words", theme, words, weights)
+            reweighted = vocabulary.set_weights(language, "words", theme, words, weights) if weights else 0
+            if added or reweighted:
+                ids = vocabulary.ids(language, "words", theme)
+                added_words = [vocabulary.word(word_id) for word_id in ids[len(ids) - added:]]
+                record = {"language": language, "section": "words", "name": theme, "words": added_words}
+                if weights is not None:
+                    record["words"], record["weights"] = words, weights
+                self._unsaved.append(record)
+                self._vocabulary_changed(language, theme, added_words)
+
+    def _vocabulary_changed(self, language: str, theme: str, added: List[str]) -> None:
+        """Update the rhyme index and publish caches without what a changed theme built.
+
+        Each cache is copied, pruned and swapped in with one assignment, so
+        a concurrent reader sees either the old cache or the new one, and a
+        generation already holding a plan finishes on the words it started with.
+        """
+        rhyme_index = self._rhyme_indexes.get(language)
+        if rhyme_index is not None:
+            rhyme_index.extend("words", theme, added)
+        self._plans = _pruned(self._plans, lambda key: key[0] == language and key[1] == theme)
+        self._pool_cache = _pruned(self._pool_cache, lambda key: key[0] == language and key[1] == theme)
+        self._translators = _pruned(self._translators, lambda key: language in key)
+        # Concepts are the positions every language shares, so any language's
+        # change to a theme can move them
+        self._concept_plans = _pruned(self._concept_plans, lambda key: key[1] == theme)
+        self._concept_renderers = _pruned(self._concept_renderers, lambda key: key[1] == theme)
+        for listener in self._change_listeners:
+            listener(language, theme)
+
+    def add_change_listener(self, listener: Callable[[Optional[str], Optional[str]], None]) -> None:
+        """Call ``listener(language, theme)`` after add_vocabulary changes a theme.
+
+        Replacing ``language_data`` calls it with ``(None, None)``. Listeners
+        run with the vocabulary lock held, after the new plans are published,
+        so they must not wait on another thread that generates poems.
+        """
+        with self._lock:
+            self._change_listeners = self._change_listeners + [listener]
+
+    def remove_change_listener(self, listener: Callable[[Optional[str], Optional[str]], None]) -> None:
+        """Stop calling a listener added with add_change_listener."""
+        with self._lock:
+            self._change_listeners = [other for other in self._change_listeners if other != listener]
+
+    def _rhyme_index(self, language: str) -> "RhymeIndex":
+        """Return a language's rhyme index, building it from its theme and emotion words."""
+        rhyme_index = self._rhyme_indexes.get(language)
+        if rhyme_index is None:
+            rhyme_index = self._rhyme_indexes[language] = RhymeIndex(language)
+            language_data = self.language_data[language]
+            for section in KEYED_SECTIONS:
+                for name in language_data[section]:
+                    rhyme_index.extend(section, name, self.vocabulary.words(language, section, name))
+        return rhyme_index
     
     def save_language_data(self, file_path: str = "poetry_data.json") -> None:
-        """Save the current language data to a JSON file."""
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(self.language_data, f, ensure_ascii=False, indent=2)
+        """Save vocabulary changes made since the last save.
+
+        Changes are appended to a journal next to the JSON file and replayed
+        on load, so a save costs O(changes) rather than O(all data). The
+        first save to a file, or one after ``language_data`` was replaced,
+        writes everything through compact_language_data instead. Once the
+        journal outgrows JOURNAL_COMPACT_BYTES it is compacted in the background.
+        """
+        if self._journal_base != os.path.abspath(file_path):
+            self.compact_language_data(file_path)
+            return
+        # Only the swap holds the vocabulary lock; the journal lock keeps saves
+        # in order while the append and its fsync run
+        with self._journal_lock:
+            with self._lock:
+                records, self._unsaved = self._unsaved, []
+            if not records:
+                return
+            try:
+                size = append_journal(journal_path_for(file_path), records)
+            except BaseException:
+                with self._lock:
+                    self._unsaved = records + self._unsaved
+                raise
+        compacting = self._compaction is not None and self._compaction.is_alive()
+        if size > JOURNAL_COMPACT_BYTES and not compacting:
+            self.compact_language_data(file_path, background=True)
+
+    def compact_language_data(self, file_path: str = "poetry_data.json",
+                              background: bool = False) -> Optional[threading.Thread]:
+        """Write all language data to the JSON file and snapshot, then clear the journal.
+
+        Both files are swapped in atomically and the journal is only trimmed
+        afterwards, so a crash at any point leaves data that loads. The data
+        is copied on the calling thread; with ``background`` the files are
+        written on a new thread, which is returned, while saves keep going
+        to the journal. Compacting into a different file is never backgrounded.
+        """
+        self.wait_for_compaction()
+        file_path = os.path.abspath(file_path)
+        journal_path = journal_path_for(file_path)
+        with self._journal_lock, self._lock:
+            data = self.vocabulary.to_dict()
+            # Everything journaled so far is in ``data``; later appends are kept
+            offset = os.path.getsize(journal_path) if os.path.exists(journal_path) else 0
+            background = background and self._journal_base == file_path
+            # Saves made while a background write runs go to the journal; the
+            # old state comes back if the write fails
+            restore = (self._unsaved, self._journal_base)
+            self._unsaved = []
+            self._journal_base = file_path
+        args = (data, file_path, offset, restore)
+        if not background:
+            self._write_compacted(*args)
+            return None
+        self._compaction = threading.Thread(target=self._write_compacted, args=args,
+                                            name="muse-lingo-compaction")
+        self._compaction.start()
+        return self._compaction
+
+    def _write_compacted(self, data: Dict[str, Dict], file_path: str, journal_offset: int,
+                         restore: Tuple[List[Dict], Optional[str]]) -> None:
+        """Write the JSON file and snapshot, then drop the journal up to ``journal_offset``.
+
+        If anything fails, the unsaved records and journal base in ``restore``
+        are put back, so the next save writes them again.
+        """
+        try:
+            tmp_path = f"{file_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, file_path)
+            # Written after the JSON file so its newer mtime selects it on load
+            write_snapshot(data, snapshot_path_for(file_path))
+            # Both renames must be on disk before the journal records they replace are dropped
+            fsync_directory(file_path)
+            with self._journal_lock:
+                trim_journal(journal_path_for(file_path), journal_offset)
+        except BaseException:
+            unsaved, journal_base = restore
+            with self._lock:
+                self._unsaved = unsaved + self._unsaved
+                if self._journal_base == file_path:
+                    self._journal_base = journal_base
+            raise
+
+    def wait_for_compaction(self) -> None:
+        """Block until a background compaction, if any, has finished."""
+        if self._compaction is not None:
+            self._compaction.join()
+            self._compaction = None
     
     def get_available_languages(self) -> List[str]:
         """Get a list of all available languages."""
@@ -371,6 +983,1945 @@ class MuseLingo:
         return self.poetry_forms
 
 
+
+def _pruned(cache: Dict, stale: Callable[[tuple], bool]) -> Dict:
+    """Return a copy of a cache, keeping its order, without the keys ``stale`` matches."""
+    fresh = cache.copy()  # A single C-level copy, safe against concurrent readers
+    for key in [key for key in fresh if stale(key)]:
+        del fresh[key]
+    return fresh
+
+
+class _ThreadRandom(threading.local):
+    """Stands in for the ``random`` module with a private generator in each thread.
+
+    Each thread's generator is seeded from the OS on first use, so threads
+    never share RNG state or its lock.
+    """
+
+    def __init__(self):
+        self.random = random.Random().random
+
+
+def stream_rng(seed: int, stream: int) -> random.Random:
+    """Return the generator for one independent, reproducible stream of ``seed``.
+
+    Give each thread or task its own ``stream`` to get the same poems no
+    matter how the work is scheduled.
+    """
+    return random.Random(_stream_seed(seed, stream))
+
+
+# Punctuation appended to lines of the generic forms
+MID_LINE_PUNCTUATION = (",", "...", ";", "—")
+END_LINE_PUNCTUATION = (".", "...", "!")
+
+
+class WordPools(NamedTuple):
+    """Word pools for one (language, theme, emotion), with capitalized variants."""
+    theme_words: Sequence[str]
+    emotion_words: Sequence[str]
+    connectors: Sequence[str]
+    starters: Sequence[str]
+    capitalized_theme: Sequence[str]
+    capitalized_emotion: Sequence[str]
+    meter: Optional[Tuple["MeterLine", ...]] = None
+    rhymes: Optional["RhymeTable"] = None
+
+
+def _capitalize(word: str) -> str:
+    """Uppercase the first letter of a word, leaving the rest untouched."""
+    return word[0].upper() + word[1:] if word else word
+
+
+# Alias tables keep each slot's own-outcome probability in fixed point with
+# this many bits, so a weighted pick compares integers only
+ALIAS_RESOLUTION_BITS = 24
+_ALIAS_MASK = (1 << ALIAS_RESOLUTION_BITS) - 1
+
+
+class AliasTable:
+    """Walker/Vose alias table for O(1) weighted picks among ``len(weights)`` outcomes.
+
+    Slot ``i`` yields outcome ``i`` with probability ``thresholds[i] / 2**24``
+    and ``alias[i]`` otherwise, so picking a slot uniformly gives every
+    outcome its share of the total weight. Building it is O(n).
+    """
+    __slots__ = ("thresholds", "alias")
+
+    def __init__(self, weights: Sequence[float]):
+        n = len(weights)
+        total = math.fsum(weights)
+        if not n or not total > 0 or not math.isfinite(total):
+            raise ValueError("Weights must have a positive, finite total")
+        scaled = [weight * n / total for weight in weights]
+        small = [i for i, share in enumerate(scaled) if share < 1.0]
+        large = [i for i, share in enumerate(scaled) if share >= 1.0]
+        one = 1 << ALIAS_RESOLUTION_BITS
+        self.thresholds = array("I", [one]) * n
+        self.alias = array("I", range(n))
+        while small and large:
+            less = small.pop()
+            more = large[-1]
+            self.thresholds[less] = round(scaled[less] * one)
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            if scaled[more] < 1.0:
+                small.append(large.pop())
+        # Whatever is left is 1.0 up to rounding and keeps its own outcome
+
+
+class WeightedWords:
+    """A word list as if each word were repeated in proportion to its weight.
+
+    The expanded list is never built: it has ``len(words) << 24`` positions,
+    and position ``k`` falls in alias slot ``k >> 24``, whose low bits pick
+    the slot's own word or its alias. Composers index it exactly like a
+    tuple, so ``words[int(rand() * len(words))]`` becomes an O(1) weighted
+    pick. ``table`` may be shared by lists that line up, such as a theme's
+    words and their capitalized variants.
+    """
+    __slots__ = ("words", "table", "_thresholds", "_alias", "_length")
+
+    def __init__(self, words: Sequence[str], table: AliasTable):
+        self.words = words
+        self.table = table
+        self._thresholds = table.thresholds
+        self._alias = table.alias
+        self._length = len(words) << ALIAS_RESOLUTION_BITS
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int) -> str:
+        slot = index >> ALIAS_RESOLUTION_BITS
+        if index & _ALIAS_MASK < self._thresholds[slot]:
+            return self.words[slot]
+        return self.words[self._alias[slot]]
+
+
+# Syllabic forms: the syllable target of each line and the word templates
+# that may fill it ("T" theme word, "E" emotion word, "C" connector). A haiku
+# uses the first three lines and a tanka all five. The fallback templates are
+# only tried for a line whose own templates cannot hit its target exactly.
+SYLLABIC_FORMS = ("haiku", "tanka")
+SYLLABIC_LINES = (
+    (5, (("T",), ("E", "T"))),
+    (7, (("E", "T"), ("E", "C", "T"), ("T", "C", "E"))),
+    (5, (("E",), ("E", "T"), ("T", "E"))),
+    (7, (("E", "C", "T"), ("E", "T"))),
+    (7, (("T", "E"), ("T", "C", "E"))),
+)
+SYLLABIC_FALLBACK_TEMPLATES = (("T", "C"), ("E", "C"), ("T", "E", "T"), ("T", "C", "T"), ("E", "C", "E"))
+
+# Lines with at most this many valid word combinations are prebuilt in full,
+# so generating them is a single lookup
+MAX_PREBUILT_LINES = 2048
+
+
+class MeterLine(NamedTuple):
+    """Precomputed syllable patterns for one line of a syllabic form.
+
+    ``patterns[i]`` is a tuple of word buckets, one per slot, whose syllable
+    counts sum to the line's target; ``cumulative`` holds the running totals
+    of the number of word combinations each pattern allows. When there are
+    few enough combinations, ``lines`` holds every one of them already joined.
+    With word weights, a pattern counts the product of its buckets' total
+    weights instead, and weighted buckets and lines are WeightedWords.
+    """
+    cumulative: List[float]
+    patterns: Tuple[Tuple[Sequence[str], ...], ...]
+    total: float
+    lines: Optional[Sequence[str]] = None
+
+
+def _build_meter(pools: WordPools, theme_counts: Sequence[int], emotion_counts: Sequence[int],
+                 connector_counts: Sequence[int], theme_weights: Optional[Sequence[float]] = None,
+                 emotion_weights: Optional[Sequence[float]] = None,
+                 capitalize: Callable[[str], str] = _capitalize) -> Tuple[MeterLine, ...]:
+    """Bucket the pools by syllable count and solve every line target.
+
+    Each template is a tiny subset-sum problem over the bucket sizes, solved
+    once here so generation never samples and rejects. If no combination
+    hits a target exactly, even with the fallback templates, the closest
+    achievable count is used instead. Buckets whose words all weigh zero
+    are left out. The first line's leading words are stored capitalized.
+    """
+    buckets = {}
+    for kind, words, counts, weights in (("T", pools.theme_words, theme_counts, theme_weights),
+                                         ("E", pools.emotion_words, emotion_counts, emotion_weights),
+                                         ("C", pools.connectors, connector_counts, None)):
+        by_count = {}
+        for position, syllables in enumerate(counts):
+            by_count.setdefault(syllables, []).append(position)
+        kind_buckets = []
+        for syllables, positions in sorted(by_count.items()):
+            group = tuple(words[position] for position in positions)
+            if weights is None:
+                kind_buckets.append((syllables, group, None, len(group), group))
+                continue
+            group_weights = [weights[position] for position in positions]
+            mass = math.fsum(group_weights)
+            if mass > 0:
+                kind_buckets.append((syllables, group, group_weights, mass,
+                                     WeightedWords(group, AliasTable(group_weights))))
+        buckets[kind] = kind_buckets
+    weighted = theme_weights is not None or emotion_weights is not None
+    
+    meter = []
+    for target, templates in SYLLABIC_LINES:
+        by_distance = {}
+        for tier in (templates, SYLLABIC_FALLBACK_TEMPLATES):
+            for template in tier:
+                for combination in itertools.product(*(buckets[kind] for kind in template)):
+                    distance = abs(sum(bucket[0] for bucket in combination) - target)
+                    by_distance.setdefault(distance, []).append(combination)
+            if 0 in by_distance:
+                break
+        if not by_distance:
+            raise ValueError("Cannot build a syllabic line from empty word pools")
+        best = by_distance[min(by_distance)]
+        cumulative = list(itertools.accumulate(math.prod(bucket[3] for bucket in combination)
+                                               for combination in best))
+        patterns = tuple(tuple(bucket[4] for bucket in combination) for combination in best)
+        if not meter:
+            patterns = tuple((_capitalized_slot(slots[0], capitalize),) + slots[1:] for slots in patterns)
+        total = cumulative[-1]
+        lines = None
+        if sum(math.prod(len(bucket[1]) for bucket in combination) for combination in best) <= MAX_PREBUILT_LINES:
+            lines = tuple(" ".join(words) for combination in best
+                          for words in itertools.product(*(bucket[1] for bucket in combination)))
+            if not meter:
+                lines = tuple(map(capitalize, lines))
+            if weighted:
+                line_weights = [math.prod(weights) for combination in best for weights in itertools.product(
+                    *(bucket[2] or [1.0] * len(bucket[1]) for bucket in combination))]
+                lines = WeightedWords(lines, AliasTable(line_weights))
+                total = len(lines)
+        meter.append(MeterLine(cumulative, patterns, total, lines))
+    return tuple(meter)
+
+
+def _capitalized_slot(slot: Sequence[str], capitalize: Callable[[str], str]) -> Sequence[str]:
+    """Return a meter bucket with every word capitalized, keeping its weights."""
+    if isinstance(slot, WeightedWords):
+        return WeightedWords(tuple(map(capitalize, slot.words)), slot.table)
+    return tuple(map(capitalize, slot))
+
+
+# English words the vowel-group rules miscount, mostly compounds whose first
+# part ends in a silent e
+ENGLISH_SYLLABLES = {
+    "awestruck": 2, "homesick": 2, "lonesome": 2, "somewhere": 2, "wherever": 3,
+}
+
+# Kana readings of the default Japanese vocabulary, used to count morae for
+# words written in kanji. Other words fall back to an estimate from the script.
+JAPANESE_READINGS = {
+    "愛": "あい", "心": "こころ", "魂": "たましい", "抱擁": "ほうよう", "崇拝": "すうはい",
+    "大切": "たいせつ", "情熱": "じょうねつ",
+    "木": "き", "川": "かわ", "山": "やま", "花": "はな", "海": "うみ", "森": "もり", "空": "そら",
+    "瞬間": "しゅんかん", "永遠": "えいえん", "時間": "じかん", "記憶": "きおく", "年齢": "ねんれい",
+    "季節": "きせつ", "十年": "じゅうねん",
+    "翼": "つばさ", "地平線": "ちへいせん", "無限": "むげん", "飛翔": "ひしょう", "無制限": "むせいげん",
+    "選択": "せんたく", "自由": "じゆう",
+    "涙": "なみだ", "影": "かげ", "喪失": "そうしつ", "悲嘆": "ひたん", "深淵": "しんえん",
+    "虚無": "きょむ", "空虚": "くうきょ",
+    "光": "ひかり", "夜明け": "よあけ", "約束": "やくそく", "種": "たね", "明日": "あした", "夢": "ゆめ",
+    "明るい": "あかるい", "踊る": "おどる", "輝く": "かがやく", "笑う": "わらう", "鮮やか": "あざやか",
+    "黄金": "おうごん",
+    "薄れゆく": "うすれゆく", "遠い": "とおい", "物悲しい": "ものがなしい", "灰色": "はいいろ",
+    "優しい": "やさしい", "静か": "しずか", "長引く": "ながびく",
+    "広大": "こうだい", "神秘的": "しんぴてき", "星空": "ほしぞら", "魔法のような": "まほうのような",
+    "息をのむ": "いきをのむ", "畏敬": "いけい",
+    "憧れ": "あこがれ", "手を伸ばす": "てをのばす", "思い出す": "おもいだす", "呼びかける": "よびかける",
+    "探し求める": "さがしもとめる", "待つ": "まつ",
+    "静止": "せいし", "平和": "へいわ", "穏やか": "おだやか", "静穏": "せいおん", "流れる": "ながれる",
+    "均衡": "きんこう", "調和": "ちょうわ",
+    "時": "とき", "通して": "とおして", "下": "した", "超えて": "こえて", "中": "なか",
+    "私は": "わたしは", "一つの": "ひとつの", "無し": "なし", "の中": "のなか",
+}
+
+_SMALL_KANA = set("ゃゅょぁぃぅぇぉゎャュョァィゥェォヮ")
+_ENGLISH_VOWELS = re.compile(r"[aeiouy]+")
+# A y before a vowel is a consonant (yearning, beyond)
+_ENGLISH_CONSONANT_Y = re.compile(r"y(?=[aeiou])")
+_ENGLISH_HIATUS = re.compile(r"[^cst]i[aou]|iet")
+# A silent e before a suffix (peaceful, lonely), but not a syllabic -le (gentleness)
+_ENGLISH_SILENT_E = re.compile(r"(?<![^aeiouy]l)(?<=[^aeiouy])e(?=(?:ful|less|ly|ment|ness|some)$)")
+_SPANISH_VOWELS = re.compile(r"[aeiouáéíóúü]+")
+_FRENCH_VOWELS = re.compile(r"[aeiouyàâäéèêëîïôöùûüÿœæ]+")
+_ARABIC_MARKS = re.compile(r"[\u064B-\u0652\u0640]")
+
+
+def _english_syllables(word: str) -> int:
+    """Estimate English syllables from vowel groups, silent e and -ed, and hiatus."""
+    word = word.lower()
+    if word in ENGLISH_SYLLABLES:
+        return ENGLISH_SYLLABLES[word]
+    word = _ENGLISH_SILENT_E.sub("", _ENGLISH_CONSONANT_Y.sub("j", word))
+    count = len(_ENGLISH_VOWELS.findall(word)) + len(_ENGLISH_HIATUS.findall(word))
+    if count > 1 and ((word.endswith("e") and not word.endswith(("le", "ee", "ye")))
+                      or (word.endswith("ed") and not word.endswith(("ted", "ded")))):
+        count -= 1
+    return count
+
+
+def _spanish_syllables(word: str) -> int:
+    """Count Spanish syllables: weak vowels join diphthongs, strong or stressed ones split."""
+    count = 0
+    for group in _SPANISH_VOWELS.findall(word.lower()):
+        count += max(1, sum(vowel in "aeoáéóíú" for vowel in group))
+    return count
+
+
+def _french_syllables(word: str) -> int:
+    """Count French syllables from vowel groups, dropping a final mute e."""
+    word = word.lower()
+    count = len(_FRENCH_VOWELS.findall(word))
+    if count > 1 and word.endswith(("e", "es")) and not word.endswith(("ée", "ées")):
+        count -= 1
+    return count
+
+
+def _japanese_morae(word: str) -> int:
+    """Count Japanese morae from the kana reading, estimating two per unread kanji."""
+    reading = JAPANESE_READINGS.get(word, word)
+    count = 0
+    for char in reading:
+        if char in _SMALL_KANA:
+            continue
+        count += 2 if "\u4e00" <= char <= "\u9fff" else 1
+    return count
+
+
+def _arabic_syllables(word: str) -> int:
+    """Estimate syllables of unvocalized Arabic as one per two letters."""
+    return len(_ARABIC_MARKS.sub("", word)) // 2
+
+
+_SYLLABLE_COUNTERS = {
+    "english": _english_syllables,
+    "spanish": _spanish_syllables,
+    "french": _french_syllables,
+    "japanese": _japanese_morae,
+    "arabic": _arabic_syllables,
+}
+
+
+def count_syllables(word: str, language: str) -> int:
+    """Count the syllables (morae for Japanese) of a word or phrase.
+
+    Every word counts at least one; languages without a dedicated counter
+    use the English rules.
+    """
+    counter = _SYLLABLE_COUNTERS.get(language, _english_syllables)
+    return sum(max(1, counter(part)) for part in word.split()) or 1
+
+
+# Rhymed forms. A quatrain picks one of RHYME_SCHEMES per poem and repeats it
+# for every four-line stanza; a sonnet is always the 14-line Shakespearean
+# ABAB CDCD EFEF GG. Each scheme is stored as the order in which a stanza
+# uses its rhyme pairs [A, A', B, B'].
+RHYMED_FORMS = ("quatrain", "sonnet")
+RHYME_SCHEMES = {"AABB": (0, 1, 2, 3), "ABAB": (0, 2, 1, 3), "ABBA": (0, 2, 3, 1)}
+SONNET_STANZAS = ((0, 2, 1, 3), (0, 2, 1, 3), (0, 2, 1, 3), (0, 1))
+_QUATRAIN_ORDERS = tuple(RHYME_SCHEMES.values())
+
+_ACCENTS = str.maketrans("áéíóúü", "aeiouu")
+_SPANISH_STRONG = "aeoáéóíú"
+_ENGLISH_RHYME_VOWELS = re.compile(r"[aeiouy]+")
+_FRENCH_SILENT_ENDINGS = ("es", "e")
+
+
+def _english_rhyme(word: str) -> str:
+    """Rhyme key: the last vowel group and what follows, looking past a silent e."""
+    stem = word[:-1] if len(word) > 2 and word.endswith("e") and word[-2] not in "aeiouy" else word
+    groups = list(_ENGLISH_RHYME_VOWELS.finditer(stem))
+    return word[groups[-1].start():] if groups else word
+
+
+def _spanish_rhyme(word: str) -> str:
+    """Rhyme key (rima consonante): everything from the stressed vowel on."""
+    groups = list(_SPANISH_VOWELS.finditer(word))
+    if not groups:
+        return word
+    stressed = next((group for group in groups if any(v in "áéíóú" for v in group.group())), None)
+    if stressed is None:
+        # Unaccented words ending in a vowel, n or s stress the penultimate syllable
+        stressed = groups[-2] if len(groups) > 1 and word[-1] in "aeiouns" else groups[-1]
+    start = stressed.start()
+    for offset, vowel in enumerate(stressed.group()):
+        if vowel in _SPANISH_STRONG:
+            start += offset
+            break
+    return word[start:].translate(_ACCENTS)
+
+
+def _french_rhyme(word: str) -> str:
+    """Rhyme key: the last sounded vowel group, dropping mute e and silent consonants."""
+    stem = word
+    for ending in _FRENCH_SILENT_ENDINGS:
+        if len(stem) > len(ending) + 1 and stem.endswith(ending):
+            stem = stem[:-len(ending)]
+            break
+    stem = stem.rstrip("stxdz") or stem
+    groups = list(_FRENCH_VOWELS.finditer(stem))
+    return stem[groups[-1].start():] if groups else stem
+
+
+def _japanese_rhyme(word: str) -> str:
+    """Rhyme key: the vowel of the final mora of the kana reading."""
+    reading = JAPANESE_READINGS.get(word, word).rstrip("ー") or word
+    last = reading[-1]
+    try:
+        name = unicodedata.name(last)
+    except ValueError:
+        return last
+    if "HIRAGANA" in name or "KATAKANA" in name:
+        return name[-1].lower()
+    return last
+
+
+def _arabic_rhyme(word: str) -> str:
+    """Rhyme key (rawi): the final letter, with a long vowel kept with its consonant."""
+    word = _ARABIC_MARKS.sub("", word).replace("ة", "ه")
+    return word[-2:] if len(word) > 1 and word[-1] in "اويى" else word[-1:]
+
+
+_RHYME_KEYS = {
+    "english": _english_rhyme,
+    "spanish": _spanish_rhyme,
+    "french": _french_rhyme,
+    "japanese": _japanese_rhyme,
+    "arabic": _arabic_rhyme,
+}
+
+
+def rhyme_key(word: str, language: str) -> str:
+    """Return the rhyme class of a word or phrase; equal keys rhyme.
+
+    Phrases rhyme on their last word. Languages without a dedicated rule use
+    the English one.
+    """
+    parts = word.lower().split()
+    if not parts:
+        return ""
+    return _RHYME_KEYS.get(language, _english_rhyme)(parts[-1])
+
+
+class RhymeTable(NamedTuple):
+    """Rhyme classes available to one (language, theme, emotion) request.
+
+    ``classes`` holds every class with at least two distinct words; ``words``
+    is the whole ending pool, used for identical rhymes when nothing rhymes.
+    """
+    classes: Tuple[Tuple[str, ...], ...]
+    words: Tuple[str, ...]
+
+
+class RhymeIndex:
+    """Rhyme classes of one language's theme and emotion words, per category.
+
+    Built once from the vocabulary and extended in place as words are added,
+    so a request's RhymeTable is a merge of two small dicts rather than a
+    search over the vocabulary.
+    """
+
+    def __init__(self, language: str):
+        self.language = language
+        self._categories: Dict[Tuple[str, str], Dict[str, List[str]]] = {}
+
+    def extend(self, section: str, name: str, words: Iterable[str]) -> None:
+        """File words of a category under their rhyme keys."""
+        classes = self._categories.setdefault((section, name), {})
+        for word in words:
+            classes.setdefault(rhyme_key(word, self.language), []).append(word)
+
+    def table(self, theme: str, emotion: str) -> RhymeTable:
+        """Merge the theme and emotion classes into a RhymeTable."""
+        merged: Dict[str, Dict[str, None]] = {}
+        for category in (("words", theme), ("emotions", emotion)):
+            for key, words in self._categories.get(category, {}).items():
+                merged.setdefault(key, {}).update(dict.fromkeys(words))
+        classes = tuple(tuple(words) for words in merged.values() if len(words) > 1)
+        return RhymeTable(classes, tuple(word for words in merged.values() for word in words))
+
+
+def _rhyme_pairs(rhymes: RhymeTable, rand: Callable[[], float]) -> List[str]:
+    """Pick the endings [A, A', B, B'] for one stanza in a constant number of draws.
+
+    A and B come from two different rhyme classes where possible, and the
+    two words of each pair are distinct members of their class.
+    """
+    classes = rhymes.classes
+    n = len(classes)
+    if not n:
+        # Nothing rhymes: repeat words instead
+        words = rhymes.words
+        a = words[int(rand() * len(words))]
+        b = words[int(rand() * len(words))]
+        return [a, a, b, b]
+    first = int(rand() * n)
+    second = (first + 1 + int(rand() * (n - 1))) % n if n > 1 else first
+    pairs = []
+    for index in (first, second):
+        words = classes[index]
+        m = len(words)
+        i = int(rand() * m)
+        pairs.append(words[i])
+        pairs.append(words[(i + 1 + int(rand() * (m - 1))) % m])
+    return pairs
+
+
+def _iter_rhymed_lines(pools: WordPools, form: str, lines: int, rand: Callable[[], float]) -> Iterator[str]:
+    """Yield the lines of a quatrain or sonnet, ending each line on its rhyme."""
+    if form == "sonnet":
+        stanzas = SONNET_STANZAS
+        last = 13
+    else:
+        count = max(1, -(-lines // 4))
+        stanzas = itertools.repeat(_QUATRAIN_ORDERS[int(rand() * len(_QUATRAIN_ORDERS))], count)
+        last = count * 4 - 1
+    theme_words, emotion_words, connectors, starters, capitalized_theme, capitalized_emotion = pools[:6]
+    rhymes = pools.rhymes
+    nt2 = len(theme_words) * 2
+    ne2 = len(emotion_words) * 2
+    nc = len(connectors)
+    ns = len(starters)
+    i = 0
+    for order in stanzas:
+        endings = _rhyme_pairs(rhymes, rand)
+        for k in order:
+            ending = endings[k]
+            x = rand()
+            if i == 0 or rand() < 0.3:  # 30% chance to start with a line starter
+                first = theme_words[int(x * nt2)] if x < 0.5 else emotion_words[int((x - 0.5) * ne2)]
+                c = rand()
+                if c < 0.3:
+                    line = f"{starters[int(rand() * ns)]} {first} {connectors[int(c / 0.3 * nc)]} {ending}"
+                else:
+                    line = f"{starters[int(rand() * ns)]} {first} {ending}"
+            else:
+                first = capitalized_theme[int(x * nt2)] if x < 0.5 else capitalized_emotion[int((x - 0.5) * ne2)]
+                c = rand()
+                if c < 0.5:
+                    line = f"{first} {connectors[int(c * 2 * nc)]} {ending}"
+                else:
+                    line = f"{first} {ending}"
+            
+            # Add punctuation occasionally
+            x = rand()
+            if i < last:
+                if x < 0.3:
+                    line += MID_LINE_PUNCTUATION[int(x / 0.3 * 4)]
+            else:
+                line += END_LINE_PUNCTUATION[int(x * 3)]
+            
+            yield line
+            i += 1
+
+
+# The composers below pick words with ``seq[int(rand() * len(seq))]`` rather
+# than ``random.choice``: one float draw per word is several times cheaper and
+# keeps every pick reproducible from a single ``random.Random`` stream.
+
+def _metered_lines(meter: Tuple["MeterLine", ...], count: int,
+                   rand: Callable[[], float]) -> List[str]:
+    """Compose the first ``count`` lines of a syllable meter.
+
+    A prebuilt line is a single lookup. Otherwise a line costs one draw to
+    pick a syllable pattern, weighted by how many word combinations it allows,
+    and one direct bucket lookup per word. The meter already capitalizes the
+    first line.
+    """
+    poem = []
+    for i in range(count):
+        cumulative, patterns, total, lines = meter[i]
+        if lines is not None:
+            poem.append(lines[int(rand() * total)])
+            continue
+        slots = patterns[bisect.bisect_right(cumulative, rand() * total)]
+        if len(slots) == 1:
+            words = slots[0]
+            line = words[int(rand() * len(words))]
+        elif len(slots) == 2:
+            first, second = slots
+            line = f"{first[int(rand() * len(first))]} {second[int(rand() * len(second))]}"
+        else:
+            line = " ".join([words[int(rand() * len(words))] for words in slots])
+        poem.append(line)
+    return poem
+
+
+def _iter_free_lines(pools: WordPools, lines: int, rand: Callable[[], float]) -> Iterator[str]:
+    """Yield lines for the generic forms (sonnet, free verse, quatrain) one at a time.
+
+    Where a coin flip decides between two pools, the same draw also picks the
+    word: ``x < 0.5`` rescaled to ``[0, 1)`` is still uniform, so one draw does
+    the work of two and each line costs about half as many calls to ``rand``.
+    """
+    theme_words, emotion_words, connectors, starters, capitalized_theme, capitalized_emotion = pools[:6]
+    nt = len(theme_words)
+    ne = len(emotion_words)
+    nt2 = nt * 2
+    ne2 = ne * 2
+    nc = len(connectors)
+    ns = len(starters)
+    last = lines - 1
+    for i in range(lines):
+        if i == 0 or rand() < 0.3:  # 30% chance to start with a line starter
+            starter = starters[int(rand() * ns)]
+            
+            # Add theme or emotion word, a connector sometimes, then another word
+            x = rand()
+            first = theme_words[int(x * nt2)] if x < 0.5 else emotion_words[int((x - 0.5) * ne2)]
+            c = rand()
+            x = rand()
+            second = theme_words[int(x * nt2)] if x < 0.5 else emotion_words[int((x - 0.5) * ne2)]
+            if c < 0.3:
+                line = f"{starter} {first} {connectors[int(c / 0.3 * nc)]} {second}"
+            else:
+                line = f"{starter} {first} {second}"
+        else:
+            # More varied line construction, capitalized through the pools
+            x = rand()
+            if x < 0.5:
+                line = (f"{capitalized_theme[int(x * nt2)]} {connectors[int(rand() * nc)]} "
+                        f"{emotion_words[int(rand() * ne)]}")
+            else:
+                line = f"{capitalized_emotion[int((x - 0.5) * ne2)]} {theme_words[int(rand() * nt)]}"
+        
+        # Add punctuation occasionally
+        x = rand()
+        if i < last:
+            if x < 0.3:
+                line += MID_LINE_PUNCTUATION[int(x / 0.3 * 4)]
+        else:
+            line += END_LINE_PUNCTUATION[int(x * 3)]
+        
+        yield line
+
+
+def _compose_haiku(pools: WordPools, lines: int, rand: Callable[[], float]) -> List[str]:
+    """A haiku: the first three lines of the meter."""
+    return _metered_lines(pools.meter, 3, rand)
+
+
+def _compose_tanka(pools: WordPools, lines: int, rand: Callable[[], float]) -> List[str]:
+    """A tanka: all five lines of the meter."""
+    return _metered_lines(pools.meter, 5, rand)
+
+
+def _compose_sonnet(pools: WordPools, lines: int, rand: Callable[[], float]) -> List[str]:
+    """A sonnet: three ABAB quatrains and a rhymed couplet."""
+    return list(_iter_rhymed_lines(pools, "sonnet", lines, rand))
+
+
+def _compose_quatrain(pools: WordPools, lines: int, rand: Callable[[], float]) -> List[str]:
+    """Quatrains sharing one rhyme scheme, enough to cover ``lines``."""
+    return list(_iter_rhymed_lines(pools, "quatrain", lines, rand))
+
+
+def _compose_free_verse(pools: WordPools, lines: int, rand: Callable[[], float]) -> List[str]:
+    """Free verse of ``lines`` lines."""
+    return list(_iter_free_lines(pools, lines, rand))
+
+
+# A composer builds a whole poem from word pools, a line count and a draw function
+Composer = Callable[[WordPools, int, Callable[[], float]], List[str]]
+FORM_COMPOSERS: Dict[str, Composer] = {
+    "haiku": _compose_haiku,
+    "sonnet": _compose_sonnet,
+    "free_verse": _compose_free_verse,
+    "quatrain": _compose_quatrain,
+    "tanka": _compose_tanka,
+}
+
+# Compiled plans kept per MuseLingo instance; the default data has 750
+# (language, theme, emotion, form) combinations, so they all fit
+MAX_CACHED_PLANS = 1024
+
+
+class GenerationPlan(NamedTuple):
+    """A request compiled once: its form's composer and the word pools it draws from."""
+    compose: Composer
+    pools: WordPools
+
+
+def _compose_from_pools(pools: WordPools, form: str, lines: int,
+                        rand: Callable[[], float]) -> List[str]:
+    """Compose a poem of the given form from resolved word pools."""
+    return FORM_COMPOSERS[form](pools, lines, rand)
+
+
+def _iter_from_pools(pools: WordPools, form: str, lines: int,
+                     rand: Callable[[], float]) -> Iterator[str]:
+    """Yield the lines of a poem of the given form as they are composed."""
+    if form == "haiku" or form == "tanka":
+        return iter(_compose_from_pools(pools, form, lines, rand))
+    if form in RHYMED_FORMS:
+        return _iter_rhymed_lines(pools, form, lines, rand)
+    return _iter_free_lines(pools, lines, rand)
+
+
+# Unique generation: poems are remembered as 64-bit fingerprints rather than
+# strings. Consecutive duplicates past this many end a unique stream early.
+UNIQUE_MAX_MISSES = 10000
+
+
+def poem_fingerprint(poem: Sequence[str]) -> int:
+    """Return a nonzero 64-bit fingerprint of a poem's lines."""
+    digest = hashlib.blake2b("\n".join(poem).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class FingerprintSet:
+    """Exact set of 64-bit fingerprints, open-addressed in a flat ``array``.
+
+    Costs 12-24 bytes per fingerprint, against well over 100 for a set of
+    poem strings. Zero marks an empty slot, which poem_fingerprint never returns.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        size = 16
+        while size * 2 < capacity * 3:
+            size *= 2
+        self._slots = array("Q", bytes(8 * size))
+        self._mask = size - 1
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, fingerprint: int) -> bool:
+        slots = self._slots
+        mask = self._mask
+        i = fingerprint & mask
+        while True:
+            value = slots[i]
+            if value == fingerprint:
+                return True
+            if not value:
+                return False
+            i = (i + 1) & mask
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the table."""
+        return len(self._slots) * 8
+
+    def add(self, fingerprint: int) -> bool:
+        """Insert a fingerprint; return False if it was already present."""
+        slots = self._slots
+        mask = self._mask
+        i = fingerprint & mask
+        while True:
+            value = slots[i]
+            if not value:
+                break
+            if value == fingerprint:
+                return False
+            i = (i + 1) & mask
+        slots[i] = fingerprint
+        self._count += 1
+        if self._count * 3 > len(slots) * 2:
+            self._grow()
+        return True
+
+    def _grow(self) -> None:
+        """Double the table and reinsert every fingerprint."""
+        old = self._slots
+        self._slots = slots = array("Q", bytes(16 * len(old)))
+        self._mask = mask = len(slots) - 1
+        for fingerprint in old:
+            if fingerprint:
+                i = fingerprint & mask
+                while slots[i]:
+                    i = (i + 1) & mask
+                slots[i] = fingerprint
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 64-bit fingerprints.
+
+    Memory is set up front from ``capacity`` and ``error_rate``. A false
+    positive makes a new poem look seen, so it is skipped; a duplicate is
+    never let through.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        capacity = max(1, capacity)
+        self._size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self._hashes = max(1, round(self._size / capacity * math.log(2)))
+        self._bits = bytearray((self._size + 7) // 8)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, fingerprint: int) -> bool:
+        bits = self._bits
+        for position in self._positions(fingerprint):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the bit array."""
+        return len(self._bits)
+
+    def _positions(self, fingerprint: int) -> Iterator[int]:
+        """Bit positions by double hashing the two halves of the fingerprint."""
+        size = self._size
+        low = fingerprint & 0xFFFFFFFF
+        high = (fingerprint >> 32) | 1
+        return ((low + i * high) % size for i in range(self._hashes))
+
+    def add(self, fingerprint: int) -> bool:
+        """Set a fingerprint's bits; return False if they were all set already."""
+        bits = self._bits
+        new = False
+        for position in self._positions(fingerprint):
+            byte = position >> 3
+            mask = 1 << (position & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                new = True
+        if new:
+            self._count += 1
+        return new
+
+
+def _drawable(words: Sequence[str]) -> Set[str]:
+    """Return the distinct words a pick from ``words`` can yield.
+
+    For WeightedWords these are the words the alias table can land on, so a
+    word of zero weight is left out; the expanded list is never walked.
+    """
+    if not isinstance(words, WeightedWords):
+        return set(words)
+    one = 1 << ALIAS_RESOLUTION_BITS
+    thresholds = words.table.thresholds
+    drawable = {words.words[slot] for slot, threshold in enumerate(thresholds) if threshold}
+    drawable.update(words.words[alias] for alias, threshold in zip(words.table.alias, thresholds) if threshold < one)
+    return drawable
+
+
+def _poem_space(pools: WordPools, form: str, lines: int) -> int:
+    """Count the distinct poems the composers can build from a plan's pools.
+
+    Mirrors the composers line by line: the count of each line shape, times
+    its punctuation choices, multiplied across the poem. Syllabic lines count
+    word combinations per pattern, not the patterns' weight mass.
+    """
+    if form in SYLLABIC_FORMS:
+        return math.prod(sum(math.prod(len(_drawable(slot)) for slot in pattern) for pattern in line.patterns)
+                         for line in pools.meter[:3 if form == "haiku" else 5])
+    theme, emotion, connectors, starters = (len(_drawable(words)) for words in pools[:4])
+    words = len(_drawable(pools.theme_words) | _drawable(pools.emotion_words))
+    if form in RHYMED_FORMS:
+        rhymes = pools.rhymes
+        if rhymes.classes:
+            pair = sum(len(words) * (len(words) - 1) for words in rhymes.classes)
+        else:
+            pair = len(set(rhymes.words))
+        if form == "sonnet":
+            line_count = 14
+            space = (pair * pair) ** 3 * pair
+        else:
+            stanzas = max(1, -(-lines // 4))
+            line_count = stanzas * 4
+            space = len(_QUATRAIN_ORDERS) * (pair * pair) ** stanzas
+        started = starters * words * (connectors + 1)
+        plain = words * (connectors + 1)
+    else:
+        line_count = lines
+        space = 1
+        started = starters * words * words * (connectors + 1)
+        plain = theme * connectors * emotion + emotion * theme
+    for i in range(line_count):
+        shapes = started if i == 0 else started + plain
+        punctuation = 1 + len(MID_LINE_PUNCTUATION) if i < line_count - 1 else len(END_LINE_PUNCTUATION)
+        space *= shapes * punctuation
+    return space
+
+
+def _iter_unique(compose: "Composer", pools: WordPools, lines: int, rand: Callable[[], float],
+                 seen: FingerprintSet, space: int, max_misses: int) -> Iterator[List[str]]:
+    """Yield poems whose fingerprints ``seen`` has not held yet, adding each one."""
+    add = seen.add
+    misses = 0
+    while len(seen) < space and misses < max_misses:
+        poem = compose(pools, lines, rand)
+        if add(poem_fingerprint(poem)):
+            misses = 0
+            yield poem
+        else:
+            misses += 1
+
+
+def _iter_translated(lines: Iterable[str], translator: Mapping[str, str]) -> Iterator[str]:
+    """Translation stage: translate each line as it arrives."""
+    if not isinstance(translator, Translator):
+        translator = Translator(translator)
+    return map(translator.translate_line, lines)
+
+
+# Punctuation kept around words when translating. Words keep their inner
+# apostrophes and hyphens, e.g. "jusqu'à" and "au-delà".
+_PUNCTUATION = ",.;:!?¡¿…—،؛؟、。"
+_PHRASE_END = ""
+
+
+class Translator(Mapping[str, str]):
+    """A compiled word and phrase translator between two languages.
+
+    Reads like the ``{source word: target word}`` dict build_translator has
+    always returned. Entries are also compiled into a trie of lowercased
+    words, so ``translate_line`` can match multi-word entries such as
+    "sin límites" or "À travers" by longest match in one pass over the
+    line, keeping punctuation and capitalization.
+    """
+
+    def __init__(self, word_map: Mapping[str, str], source: Optional[str] = None,
+                 target: Optional[str] = None):
+        self.source = source
+        self.target = target
+        self._word_map = dict(word_map)
+        self._trie: Dict[str, Dict] = {}
+        # Lowercase entries win over capitalized ones that fold onto them
+        for word in sorted(self._word_map, key=lambda word: word == word.lower()):
+            node = self._trie
+            for token in word.lower().split():
+                node = node.setdefault(token.strip(_PUNCTUATION) or token, {})
+            node[_PHRASE_END] = self._word_map[word]
+        # Words that start no longer phrase skip the trie walk entirely
+        self._words = {word: node[_PHRASE_END] for word, node in self._trie.items()
+                       if len(node) == 1 and _PHRASE_END in node}
+
+    def __getitem__(self, word: str) -> str:
+        return self._word_map[word]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._word_map)
+
+    def __len__(self) -> int:
+        return len(self._word_map)
+
+    def __repr__(self) -> str:
+        return f"Translator({self.source!r} -> {self.target!r}, {len(self)} entries)"
+
+    def translate_line(self, line: str) -> str:
+        """Translate one line, replacing the longest known phrase at each word."""
+        chunks = line.split()
+        words = self._words
+        trie = self._trie
+        punctuation = _PUNCTUATION
+        out = []
+        i = 0
+        n = len(chunks)
+        while i < n:
+            chunk = chunks[i]
+            i += 1
+            word = chunk.strip(punctuation)
+            lowered = word.lower()
+            match = words.get(lowered)
+            if match is not None:
+                translated = _match_case(word, match)
+                out.append(translated if word == chunk else chunk.replace(word, translated, 1))
+                continue
+            node = trie.get(lowered) if word else None
+            if node is None:
+                out.append(chunk)
+                continue
+            
+            # Extend the match over following words until punctuation or a trie miss
+            match = node.get(_PHRASE_END)
+            end = j = i - 1
+            if chunk.endswith(word):
+                while j + 1 < n:
+                    following = chunks[j + 1]
+                    next_word = following.rstrip(punctuation)
+                    if not next_word or next_word[0] in punctuation:
+                        break
+                    node = node.get(next_word.lower())
+                    if node is None:
+                        break
+                    j += 1
+                    if _PHRASE_END in node:
+                        match = node[_PHRASE_END]
+                        end = j
+                    if len(next_word) != len(following):
+                        break
+            
+            if match is None:
+                out.append(chunk)
+                continue
+            last = chunks[end]
+            out.append(chunk[:chunk.index(word)] + _match_case(word, match)
+                       + last[len(last.rstrip(punctuation)):])
+            i = end + 1
+        return " ".join(out)
+
+    def translate_lines(self, lines: Iterable[str]) -> Iterator[str]:
+        """Lazily translate a stream of lines."""
+        return map(self.translate_line, lines)
+
+
+def _match_case(source: str, translated: str) -> str:
+    """Carry the capitalization of a source word over to its translation."""
+    if not translated:
+        return translated
+    if source[0].isupper():
+        if len(source) > 1 and source.isupper():
+            return translated.upper()
+        return translated[0].upper() + translated[1:]
+    if source[0].islower() and translated[0].isupper() and not translated.isupper():
+        # Capitalized line starters used mid-line
+        return translated[0].lower() + translated[1:]
+    return translated
+
+
+# Concept poems: each vocabulary position every language shares is a
+# concept, spelled in base CONCEPT_DIGITS with the least significant digit
+# first. That digit is the private-use code point CONCEPT_BASE + 2 * digit,
+# whose low bit is the case flag, and any higher digits follow in plane 16,
+# so spellings grow with the vocabulary rather than run out. Punctuation and
+# spaces stay literal, so while every concept is one code point a poem
+# renders into a language with one str.translate per line.
+CONCEPT_BASE = 0xF0000
+CONCEPT_DIGITS = 0x8000
+_CONCEPT_HIGH_BASE = 0x100000
+_CONCEPT_TOKEN = re.compile(f"[{chr(CONCEPT_BASE)}-{chr(CONCEPT_BASE + 2 * CONCEPT_DIGITS - 1)}]"
+                            f"[{chr(_CONCEPT_HIGH_BASE)}-{chr(_CONCEPT_HIGH_BASE + CONCEPT_DIGITS - 1)}]*")
+
+
+class ConceptPoem(NamedTuple):
+    """A language-neutral poem: lines of concept codes, spaces and punctuation.
+
+    ``source`` is the language whose syllables and rhymes shaped it.
+    """
+    theme: str
+    emotion: str
+    source: str
+    lines: Tuple[str, ...]
+
+
+def _concept_code(concept: int) -> str:
+    """Return the lowercase spelling of a concept."""
+    concept, digit = divmod(concept, CONCEPT_DIGITS)
+    code = chr(CONCEPT_BASE + 2 * digit)
+    while concept:
+        concept, digit = divmod(concept, CONCEPT_DIGITS)
+        code += chr(_CONCEPT_HIGH_BASE + digit)
+    return code
+
+
+def _capitalize_concept(text: str) -> str:
+    """Set the case flag of the concept a text starts with."""
+    return chr(ord(text[0]) | 1) + text[1:] if text else text
+
+
+# Snapshot layout: magic, little-endian uint32 header length, a compact JSON
+# header mapping each language to the (offset, length) of its section, then
+# one compact UTF-8 JSON section per language.
+SNAPSHOT_MAGIC = b"MLSNAP01"
+_SNAPSHOT_HEADER = struct.Struct("<8sI")
+
+
+def snapshot_path_for(data_path: str) -> str:
+    """Return the snapshot file that sits next to a JSON data file."""
+    return os.path.splitext(data_path)[0] + ".mlsnap"
+
+
+def fsync_directory(path: str) -> None:
+    """Sync the directory holding ``path``, so renames into it survive a power loss."""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return  # Directories cannot be opened this way on Windows
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass  # Some filesystems do not support syncing a directory
+    finally:
+        os.close(fd)
+
+
+def write_snapshot(language_data: Mapping[str, Dict], path: str) -> None:
+    """Write language data as a snapshot, atomically replacing any existing file.
+
+    The file is synced before the rename; sync its directory with
+    fsync_directory to make the rename itself durable.
+    """
+    sections = []
+    index = {}
+    offset = 0
+    for language, data in language_data.items():
+        section = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        index[language] = [offset, len(section)]
+        sections.append(section)
+        offset += len(section)
+    header = json.dumps({"languages": index}, separators=(",", ":")).encode("utf-8")
+    
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, len(header)))
+        f.write(header)
+        f.writelines(sections)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class LanguageSnapshot:
+    """A memory-mapped snapshot file whose languages are decoded on demand.
+
+    The map is closed once every language has been decoded, so the file can
+    be replaced afterwards, even on Windows.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, header_length = _SNAPSHOT_HEADER.unpack_from(self._map)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not a MuseLingo snapshot")
+            start = _SNAPSHOT_HEADER.size
+            self._index = json.loads(self._map[start:start + header_length])["languages"]
+        except (struct.error, KeyError, ValueError) as e:
+            self._map.close()
+            raise ValueError(f"Corrupt snapshot {path}: {e}") from e
+        self._base = start + header_length
+        self._undecoded = set(self._index)
+
+    def languages(self) -> List[str]:
+        """List the languages stored in the snapshot."""
+        return list(self._index)
+
+    def load(self, language: str) -> Dict:
+        """Decode one language's section, closing the map after the last one."""
+        offset, length = self._index[language]
+        start = self._base + offset
+        data = json.loads(self._map[start:start + length])
+        self._undecoded.discard(language)
+        if not self._undecoded:
+            self._map.close()
+        return data
+
+    def close(self) -> None:
+        """Release the memory map."""
+        self._map.close()
+
+
+# Journal layout: one compact JSON record per line, each adding ``words`` to
+# the ``name`` category of a language's ``section``. Records are only ever
+# appended; a torn last line from a crash is skipped on replay.
+JOURNAL_COMPACT_BYTES = 1 << 20
+
+
+def journal_path_for(data_path: str) -> str:
+    """Return the vocabulary journal that sits next to a JSON data file."""
+    return os.path.splitext(data_path)[0] + ".mljournal"
+
+
+def read_journal(path: str) -> Iterator[Dict]:
+    """Yield the complete records of a journal, in order (nothing if it is missing)."""
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Torn write
+            if isinstance(record, dict) and {"language", "section", "name", "words"} <= record.keys():
+                yield record
+
+
+def append_journal(path: str, records: Iterable[Mapping]) -> int:
+    """Append records to a journal, sync it to disk, and return its new size."""
+    with open(path, 'ab') as f:
+        if f.tell():
+            with open(path, 'rb') as tail:
+                tail.seek(-1, os.SEEK_END)
+                if tail.read(1) != b"\n":
+                    f.write(b"\n")  # Keep a torn last line from swallowing the next record
+        lines = [json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n" for record in records]
+        if lines:
+            f.write("".join(lines).encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        return f.tell()
+
+
+def trim_journal(path: str, offset: int) -> None:
+    """Atomically drop the first ``offset`` bytes of a journal, removing it if nothing is left."""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            tail = f.read()
+    except FileNotFoundError:
+        return
+    if not tail:
+        os.remove(path)
+        return
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(tail)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# Sections of a language's data that hold vocabulary; anything else (such
+# as "structures") is kept as is. Keyed sections map a theme or emotion to a
+# word list, flat sections are a single word list.
+KEYED_SECTIONS = ("words", "emotions")
+FLAT_SECTIONS = ("connectors", "line_starters")
+# Optional section giving keyed categories sampling weights, sparsely:
+# {"words": {"love": {"heart": 3.0}}}; unlisted words weigh 1.0
+WEIGHTS_SECTION = "weights"
+
+
+class VocabularyStore:
+    """Interned, array-backed storage for every language's vocabulary.
+
+    Each distinct word is stored once and referred to by an integer ID, and
+    each (language, section, name) category is a contiguous ``array`` of IDs
+    in insertion order, so positions still line up across languages. Inserts
+    through ``add`` skip words the category already holds. Languages can be
+    attached with a loader and are only decoded on first access.
+
+    A keyed category may also carry a parallel ``array`` of sampling weights;
+    categories without one are sampled uniformly. Alias tables over the
+    weights are built on first use and dropped when their category changes.
+    """
+
+    def __init__(self):
+        self._strings: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._categories: Dict[Tuple[str, str, str], array] = {}
+        self._members: Dict[Tuple[str, str, str], Dict[int, int]] = {}
+        self._weights: Dict[Tuple[str, str, str], array] = {}
+        self._alias_tables: Dict[Tuple[str, str, str], AliasTable] = {}
+        self._syllables: Dict[str, array] = {}
+        self._layouts: Dict[str, Dict[str, object]] = {}
+        self._pending: Dict[str, Callable[[], Dict]] = {}
+        self._order: List[str] = []
+
+    def __len__(self) -> int:
+        """Number of distinct words across all languages."""
+        return len(self._strings)
+
+    def languages(self) -> List[str]:
+        """List the stored languages, loaded or not."""
+        return list(self._order)
+
+    def attach(self, language: str, loader: Callable[[], Dict]) -> None:
+        """Register a language to be decoded by ``loader`` on first access."""
+        if language not in self._order:
+            self._order.append(language)
+        self._pending[language] = loader
+
+    def load(self, language: str, data: Mapping) -> None:
+        """Store a language from a nested dict in the JSON file layout."""
+        if language not in self._order:
+            self._order.append(language)
+        self._pending.pop(language, None)
+        layout = self._layouts[language] = {}
+        weights = {}
+        for section, value in data.items():
+            if section == WEIGHTS_SECTION:
+                weights = value
+            elif section in KEYED_SECTIONS:
+                layout[section] = list(value)
+                for name, words in value.items():
+                    self._set_category((language, section, name), words)
+            elif section in FLAT_SECTIONS:
+                layout[section] = None
+                self._set_category((language, section, ""), value)
+            else:
+                layout[section] = value
+        for section, names in weights.items():
+            for name, word_weights in names.items():
+                ids = self._categories.get((language, section, name))
+                if ids is not None:
+                    weight_of = {self.intern(word): float(weight) for word, weight in word_weights.items()}
+                    self._weights[language, section, name] = array(
+                        "d", [weight_of.get(word_id, 1.0) for word_id in ids])
+
+    def _set_category(self, key: Tuple[str, str, str], words: Iterable[str]) -> None:
+        """Replace a category's contents, keeping duplicates and order as given."""
+        self._categories[key] = array("I", map(self.intern, words))
+        self._members.pop(key, None)
+        self._weights.pop(key, None)
+        self._alias_tables.pop(key, None)
+
+    def _layout(self, language: str) -> Dict[str, object]:
+        """Return a language's section layout, decoding it first if needed."""
+        layout = self._layouts.get(language)
+        if layout is None:
+            loader = self._pending.get(language)
+            if loader is None:
+                raise KeyError(language)
+            self.load(language, loader())
+            layout = self._layouts[language]
+        return layout
+
+    def intern(self, word: str) -> int:
+        """Return the ID of a word, assigning one if it is new."""
+        word_id = self._ids.get(word)
+        if word_id is None:
+            word_id = self._ids[word] = len(self._strings)
+            self._strings.append(sys.intern(word))
+        return word_id
+
+    def word(self, word_id: int) -> str:
+        """Return the word with the given ID."""
+        return self._strings[word_id]
+
+    def ids(self, language: str, section: str, name: str = "") -> array:
+        """Return the live ID array of a category."""
+        key = (language, section, name)
+        ids = self._categories.get(key)
+        if ids is None:
+            self._layout(language)
+            ids = self._categories[key]
+        return ids
+
+    def words(self, language: str, section: str, name: str = "") -> Tuple[str, ...]:
+        """Return a category's words as a tuple."""
+        return tuple(map(self._strings.__getitem__, self.ids(language, section, name)))
+
+    def syllable_counts(self, language: str, section: str, name: str = "") -> List[int]:
+        """Return the syllable count of each word in a category, in order.
+
+        Counts are computed once per (language, word) and kept in a per-language
+        byte array indexed by word ID.
+        """
+        ids = self.ids(language, section, name)
+        counts = self._syllables.get(language)
+        if counts is None:
+            counts = self._syllables[language] = array("B")
+        if len(counts) < len(self._strings):
+            counts.frombytes(bytes(len(self._strings) - len(counts)))
+        result = []
+        for word_id in ids:
+            syllables = counts[word_id]
+            if not syllables:
+                syllables = counts[word_id] = min(255, count_syllables(self._strings[word_id], language))
+            result.append(syllables)
+        return result
+
+    def add(self, language: str, section: str, name: str, words: Iterable[str],
+            weights: Optional[Iterable[float]] = None) -> int:
+        """Append words a category does not hold yet; return how many were added.
+
+        ``weights`` runs parallel to ``words`` and makes the category weighted;
+        new words of an already weighted category default to 1.0. The weights
+        of words the category already holds are left alone (see set_weights).
+        """
+        key = (language, section, name)
+        layout = self._layout(language)
+        ids = self._categories.get(key)
+        if ids is None:
+            ids = self._categories[key] = array("I")
+            if section in KEYED_SECTIONS:
+                layout.setdefault(section, []).append(name)
+            else:
+                layout[section] = None
+        members = self._member_positions(key, ids)
+        word_weights = self._weights.get(key)
+        if weights is not None and word_weights is None:
+            word_weights = self._weights[key] = array("d", [1.0]) * len(ids)
+        added = 0
+        if word_weights is None:
+            for word in words:
+                word_id = self.intern(word)
+                if word_id not in members:
+                    members[word_id] = len(ids)
+                    ids.append(word_id)
+                    added += 1
+        else:
+            for word, weight in zip(words, itertools.repeat(1.0) if weights is None else weights):
+                word_id = self.intern(word)
+                if word_id not in members:
+                    members[word_id] = len(ids)
+                    ids.append(word_id)
+                    word_weights.append(weight)
+                    added += 1
+        if added or weights is not None:
+            self._alias_tables.pop(key, None)
+        return added
+
+    def set_weights(self, language: str, section: str, name: str, words: Iterable[str],
+                    weights: Iterable[float]) -> int:
+        """Set the sampling weights of words a category holds; return how many changed.
+
+        Words the category does not hold are ignored.
+        """
+        key = (language, section, name)
+        ids = self.ids(language, section, name)
+        members = self._member_positions(key, ids)
+        word_weights = self._weights.get(key)
+        if word_weights is None:
+            word_weights = self._weights[key] = array("d", [1.0]) * len(ids)
+        changed = 0
+        for word, weight in zip(words, weights):
+            position = members.get(self._ids.get(word, -1))
+            if position is not None and word_weights[position] != weight:
+                word_weights[position] = weight
+                changed += 1
+        self._alias_tables.pop(key, None)
+        return changed
+
+    def weight_total(self, language: str, section: str, name: str, words: Iterable[str],
+                     weights: Iterable[float]) -> float:
+        """Return a category's total weight as add and set_weights with these arguments would leave it.
+
+        Nothing is changed. Words without a weight count as 1.0.
+        """
+        key = (language, section, name)
+        ids = self.ids(language, section, name)
+        current = self._weights.get(key)
+        resulting = array("d", current) if current is not None else array("d", [1.0]) * len(ids)
+        members = self._member_positions(key, ids)
+        added = {}
+        for word, weight in zip(words, weights):
+            position = members.get(self._ids.get(word, -1))
+            if position is None:
+                added[word] = weight  # set_weights then gives a repeated word its last weight
+            else:
+                resulting[position] = weight
+        return math.fsum(itertools.chain(resulting, added.values()))
+
+    def _member_positions(self, key: Tuple[str, str, str], ids: array) -> Dict[int, int]:
+        """Return a category's word-ID -> first-position map, building it on first use."""
+        members = self._members.get(key)
+        if members is None:
+            members = self._members[key] = {}
+            for position, word_id in enumerate(ids):
+                members.setdefault(word_id, position)
+        return members
+
+    def weights(self, language: str, section: str, name: str = "") -> Optional[array]:
+        """Return the live weight array of a category, or None if it is sampled uniformly."""
+        key = (language, section, name)
+        if key not in self._categories:
+            self._layout(language)
+        return self._weights.get(key)
+
+    def alias_table(self, language: str, section: str, name: str = "") -> Optional[AliasTable]:
+        """Return the alias table of a weighted category, rebuilding it if it changed."""
+        key = (language, section, name)
+        table = self._alias_tables.get(key)
+        if table is None:
+            weights = self.weights(language, section, name)
+            if weights is None:
+                return None
+            table = self._alias_tables[key] = AliasTable(weights)
+        return table
+
+    def language_dict(self, language: str) -> Dict:
+        """Rebuild one language as a nested dict in the JSON file layout."""
+        data = {}
+        for section, names in self._layout(language).items():
+            if section in KEYED_SECTIONS:
+                data[section] = {name: list(self.words(language, section, name)) for name in names}
+            elif section in FLAT_SECTIONS:
+                data[section] = list(self.words(language, section))
+            else:
+                data[section] = names
+        weights = {}
+        for (weighted_language, section, name), word_weights in self._weights.items():
+            if weighted_language == language:
+                weights.setdefault(section, {})[name] = {
+                    self._strings[word_id]: weight
+                    for word_id, weight in zip(self._categories[language, section, name], word_weights)
+                    if weight != 1.0}
+        if weights:
+            data[WEIGHTS_SECTION] = weights
+        return data
+
+    def to_dict(self) -> Dict[str, Dict]:
+        """Rebuild every language as nested dicts in the JSON file layout."""
+        return {language: self.language_dict(language) for language in self._order}
+
+
+class WordList(Sequence):
+    """Read-only, live view of one vocabulary category as a list of words."""
+
+    def __init__(self, store: VocabularyStore, key: Tuple[str, str, str]):
+        self._store = store
+        self._key = key
+
+    def __getitem__(self, index):
+        ids = self._store.ids(*self._key)
+        if isinstance(index, slice):
+            return [self._store.word(word_id) for word_id in ids[index]]
+        return self._store.word(ids[index])
+
+    def __len__(self) -> int:
+        return len(self._store.ids(*self._key))
+
+    def __iter__(self) -> Iterator[str]:
+        return map(self._store.word, self._store.ids(*self._key))
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Sequence) and list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+class _SectionView(Mapping):
+    """Read-only view of a keyed section, e.g. a language's themes."""
+
+    def __init__(self, store: VocabularyStore, language: str, section: str, names: List[str]):
+        self._store = store
+        self._language = language
+        self._section = section
+        self._names = names
+
+    def __getitem__(self, name: str) -> WordList:
+        if name not in self._names:
+            raise KeyError(name)
+        return WordList(self._store, (self._language, self._section, name))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+class _LanguageView(Mapping):
+    """Read-only view of one language's data."""
+
+    def __init__(self, store: VocabularyStore, language: str):
+        self._store = store
+        self._language = language
+        self._layout = store._layout(language)
+
+    def __getitem__(self, section: str):
+        value = self._layout[section]
+        if section in KEYED_SECTIONS:
+            return _SectionView(self._store, self._language, section, value)
+        if section in FLAT_SECTIONS:
+            return WordList(self._store, (self._language, section, ""))
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._layout)
+
+    def __len__(self) -> int:
+        return len(self._layout)
+
+    def to_dict(self) -> Dict:
+        """Copy this language into plain dicts and lists in the JSON file layout."""
+        return self._store.language_dict(self._language)
+
+
+class VocabularyView(Mapping):
+    """Read-only view of a VocabularyStore in the nested ``language_data`` layout.
+
+    ``view[language]["words"][theme]`` and the like return live, read-only
+    word sequences, so code written against the old dict-of-lists layout keeps
+    working; changes go through ``MuseLingo.add_vocabulary``. The view is not
+    a dict, so use ``to_dict()`` to serialize it.
+    """
+
+    def __init__(self, store: VocabularyStore):
+        self._store = store
+
+    def __getitem__(self, language: str) -> _LanguageView:
+        return _LanguageView(self._store, language)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store.languages())
+
+    def __len__(self) -> int:
+        return len(self._store.languages())
+
+    def to_dict(self) -> Dict[str, Dict]:
+        """Copy every language into plain dicts and lists in the JSON file layout."""
+        return self._store.to_dict()
+
+
+# Instrumentation: per-stage timing histograms and labelled counters. A
+# MuseLingo instance only records into a Metrics it has been given, and checks
+# for one with a single attribute test, so it costs nothing measurable when off.
+# Stages: load, load_language, plan (with validate and pools on a plan cache
+# miss), compose, translate, render, build_translator, and generate for a
+# whole generate_poem call.
+
+# Histogram bucket upper bounds in seconds
+METRIC_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+                  1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Timing histogram over fixed buckets, plus the running count and sum."""
+
+    def __init__(self, buckets: Sequence[float] = METRIC_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # The last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Record one duration."""
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def merge(self, other: "Histogram") -> None:
+        """Add another histogram with the same buckets into this one."""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, fraction: float) -> float:
+        """Estimate a quantile by interpolating inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class Metrics:
+    """Per-stage timing histograms and labelled counters for MuseLingo.
+
+    Counters are keyed by name and a tuple of (label, value) pairs, such as
+    ``("poems", (("language", "english"), ("form", "haiku")))``. Export with
+    ``export("prometheus")`` or ``export("json")``, or any format added
+    through register_exporter. Safe to share between threads.
+    """
+
+    def __init__(self, buckets: Sequence[float] = METRIC_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.stages: Dict[str, Histogram] = {}
+        self.counters: Dict[Tuple[str, Labels], int] = collections.Counter()
+        self._lock = threading.RLock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record the duration of one pass through a stage."""
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def count(self, name: str, labels: Labels = (), amount: int = 1) -> None:
+        """Increment a labelled counter."""
+        with self._lock:
+            self.counters[(name, labels)] += amount
+
+    def merge(self, other: "Metrics") -> None:
+        """Add everything another Metrics recorded into this one."""
+        with self._lock, other._lock:
+            for stage, histogram in other.stages.items():
+                own = self.stages.get(stage)
+                if own is None:
+                    own = self.stages[stage] = Histogram(self.buckets)
+                own.merge(histogram)
+            self.counters.update(other.counters)
+
+    def reset(self) -> None:
+        """Forget everything recorded so far."""
+        with self._lock:
+            self.stages.clear()
+            self.counters.clear()
+
+    def snapshot(self) -> Dict:
+        """Summarize the metrics as a JSON-serializable dict."""
+        with self._lock:
+            counters: Dict[str, List[Dict]] = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                counters.setdefault(name, []).append({"labels": dict(labels), "value": value})
+            return {
+                "stages": {stage: {"count": histogram.count,
+                                   "sum_s": histogram.sum,
+                                   "p50_s": histogram.quantile(0.50),
+                                   "p99_s": histogram.quantile(0.99)}
+                           for stage, histogram in sorted(self.stages.items())},
+                "counters": counters,
+            }
+
+    def export(self, format: str = "json") -> str:
+        """Render the metrics with a registered exporter."""
+        exporter = METRIC_EXPORTERS.get(format)
+        if exporter is None:
+            raise ValueError(f"Unknown metrics format '{format}'. Choose from: {', '.join(METRIC_EXPORTERS)}")
+        with self._lock:
+            return exporter(self)
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Return a percentile of already sorted values (0.0 if empty)."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def _timed(metrics: Metrics, stage: str, func: Callable[[], object]) -> object:
+    """Call ``func`` and record how long it took as a pass through ``stage``."""
+    started = time.perf_counter()
+    try:
+        return func()
+    finally:
+        metrics.observe(stage, time.perf_counter() - started)
+
+
+# The profile() collectors open in the current thread or asyncio task, as
+# (MuseLingo instance, Metrics) pairs, innermost last
+_active_profiles: "contextvars.ContextVar[Tuple[Tuple[MuseLingo, Metrics], ...]]" = \
+    contextvars.ContextVar("muse_lingo_profiles", default=())
+
+
+class _ProfileRecorder:
+    """Records into a MuseLingo's attached Metrics and into the caller's open profile() blocks."""
+    __slots__ = ("_muse", "_attached")
+
+    def __init__(self, muse: MuseLingo, attached: Optional[Metrics]):
+        self._muse = muse
+        self._attached = attached
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record one duration of a stage."""
+        if self._attached is not None:
+            self._attached.observe(stage, seconds)
+        for owner, metrics in _active_profiles.get():
+            if owner is self._muse:
+                metrics.observe(stage, seconds)
+
+    def count(self, name: str, labels: Labels = (), amount: int = 1) -> None:
+        """Add to a counter."""
+        if self._attached is not None:
+            self._attached.count(name, labels, amount)
+        for owner, metrics in _active_profiles.get():
+            if owner is self._muse:
+                metrics.count(name, labels, amount)
+
+
+@contextlib.contextmanager
+def _profile(muse: MuseLingo) -> Iterator[Metrics]:
+    """Collect the calls ``muse`` makes in this context into a fresh Metrics for a with block."""
+    attached = muse.metrics
+    profiled = Metrics(attached.buckets if attached is not None else METRIC_BUCKETS)
+    entry = (muse, profiled)
+    _active_profiles.set(_active_profiles.get() + (entry,))
+    with muse._lock:
+        muse._profiles += 1
+        muse._update_recorder()
+    try:
+        yield profiled
+    finally:
+        with muse._lock:
+            muse._profiles -= 1
+            muse._update_recorder()
+        # Removed by identity, so blocks may close in any order
+        _active_profiles.set(tuple(active for active in _active_profiles.get() if active is not entry))
+
+
+def _prometheus_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    """Format labels as ``{name="value",...}``, escaped for the text format."""
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def prometheus_text(metrics: Metrics) -> str:
+    """Export metrics in the Prometheus text exposition format."""
+    out = []
+    if metrics.stages:
+        out.append("# HELP muselingo_stage_seconds Time spent in each stage of the generation pipeline.")
+        out.append("# TYPE muselingo_stage_seconds histogram")
+        for stage, histogram in sorted(metrics.stages.items()):
+            cumulative = 0
+            bounds = [repr(bound) for bound in histogram.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, histogram.counts):
+                cumulative += count
+                labels = _prometheus_labels((("stage", stage), ("le", bound)))
+                out.append(f"muselingo_stage_seconds_bucket{labels} {cumulative}")
+            labels = _prometheus_labels((("stage", stage),))
+            out.append(f"muselingo_stage_seconds_sum{labels} {histogram.sum!r}")
+            out.append(f"muselingo_stage_seconds_count{labels} {histogram.count}")
+    by_name: Dict[str, List[Tuple[Labels, int]]] = {}
+    for (name, labels), value in sorted(metrics.counters.items()):
+        by_name.setdefault(name, []).append((labels, value))
+    for name, series in by_name.items():
+        out.append(f"# TYPE muselingo_{name}_total counter")
+        for labels, value in series:
+            out.append(f"muselingo_{name}_total{_prometheus_labels(labels)} {value}")
+    return "\n".join(out) + "\n"
+
+
+def json_snapshot(metrics: Metrics) -> str:
+    """Export metrics as a JSON document."""
+    return json.dumps(metrics.snapshot(), ensure_ascii=False, indent=2)
+
+
+METRIC_EXPORTERS: Dict[str, Callable[[Metrics], str]] = {"prometheus": prometheus_text, "json": json_snapshot}
+
+
+def register_exporter(format: str, exporter: Callable[[Metrics], str]) -> None:
+    """Make ``exporter`` available as ``Metrics.export(format)``."""
+    METRIC_EXPORTERS[format] = exporter
+
+
+# Poems per work unit in bulk corpus generation. Chunk boundaries and seeds
+# depend only on this and the corpus seed, never on the number of workers.
+CORPUS_CHUNK_SIZE = 1000
+
+# Worker-side state for bulk generation, set once per process by _corpus_worker_init
+_corpus_worker = None
+
+
+def _stream_seed(seed: int, stream: int) -> int:
+    """Derive the deterministic sub-seed of one stream, such as a corpus chunk."""
+    digest = hashlib.blake2b(f"{seed}:{stream}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def _corpus_worker_init(data_path: str, spec: Tuple, translate: Optional[str]) -> None:
+    """Build the MuseLingo instance and translator a corpus worker reuses."""
+    global _corpus_worker
+    muse = MuseLingo(data_path)
+    translator = muse.build_translator(spec[0], translate) if translate else None
+    _corpus_worker = (muse, spec, translate, translator)
+
+
+def _corpus_chunk(seed: int, chunk_index: int, start: int, count: int) -> str:
+    """Generate one chunk of the corpus as JSON lines."""
+    muse, spec, translate, translator = _corpus_worker
+    language, theme, emotion, form = spec[:4]
+    poems = muse.iter_poems(itertools.repeat(spec, count), seed=_stream_seed(seed, chunk_index))
+    records = []
+    for offset, poem in enumerate(poems):
+        record = {"id": start + offset, "language": language, "theme": theme,
+                  "emotion": emotion, "form": form, "poem": poem}
+        if translator:
+            record["translation"] = {"language": translate, "poem": muse.translate_poem(poem, translator)}
+        records.append(json.dumps(record, ensure_ascii=False) + "\n")
+    return "".join(records)
+
+
+def _corpus_unique_chunk(seed: int, chunk_index: int, start: int, count: int) -> List[Tuple[int, str]]:
+    """Generate one chunk of candidate poems for unique mode as (fingerprint, record) pairs.
+
+    The JSON records leave out the id, which the parent assigns once it has
+    dropped the duplicates.
+    """
+    muse, spec, translate, translator = _corpus_worker
+    language, theme, emotion, form = spec[:4]
+    poems = muse.iter_poems(itertools.repeat(spec, count), seed=_stream_seed(seed, chunk_index))
+    candidates = []
+    for poem in poems:
+        record = {"language": language, "theme": theme, "emotion": emotion, "form": form, "poem": poem}
+        if translator:
+            record["translation"] = {"language": translate, "poem": muse.translate_poem(poem, translator)}
+        candidates.append((poem_fingerprint(poem), json.dumps(record, ensure_ascii=False)))
+    return candidates
+
+
+def _iter_corpus_chunks(worker: Callable, chunks: Iterable[Tuple], workers: int,
+                        initargs: Tuple) -> Iterator:
+    """Run ``worker`` over ``chunks`` and yield the results in chunk order."""
+    if workers <= 1:
+        _corpus_worker_init(*initargs)
+        for chunk in chunks:
+            yield worker(*chunk)
+        return
+    
+    # Keep a bounded window of chunks in flight so memory stays flat
+    with multiprocessing.Pool(workers, _corpus_worker_init, initargs) as pool:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(worker, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def generate_corpus(output: TextIO, count: int, language: str, theme: str, emotion: str, form: str,
+                    lines: int = 6, translate: Optional[str] = None, seed: int = 0, workers: int = 1,
+                    data_path: str = "poetry_data.json", chunk_size: int = CORPUS_CHUNK_SIZE,
+                    unique: bool = False, bloom_error_rate: Optional[float] = None,
+                    max_misses: int = UNIQUE_MAX_MISSES) -> int:
+    """Stream ``count`` poems as JSON lines to ``output`` using a pool of worker processes.
+
+    The corpus is cut into fixed-size chunks, each generated from its own
+    sub-seed of ``seed`` and written in order as soon as it is ready, so the
+    output is identical for any number of workers and only a few chunks are
+    ever held in memory. Returns the number of poems written.
+    
+    With ``unique``, duplicates are dropped against a FingerprintSet, or a
+    BloomFilter of ``bloom_error_rate`` sized for ``count``, and generation
+    stops early, writing fewer than ``count`` poems, once the combination's
+    estimated poem space is used up or after ``max_misses`` duplicates in a row.
+    """
+    if count < 0 or lines < 0 or workers < 1:
+        raise ValueError("count and lines must not be negative, and workers must be at least 1")
+    spec = (language, theme, emotion, form, lines)
+    muse = MuseLingo(data_path)
+    muse.validate_request(language, theme, emotion, form)
+    if translate and translate not in muse.languages:
+        raise ValueError(f"Language '{translate}' not supported. Choose from: {', '.join(muse.languages)}")
+    initargs = (data_path, spec, translate)
+    
+    if not unique:
+        chunks = ((seed, index, start, min(chunk_size, count - start))
+                  for index, start in enumerate(range(0, count, chunk_size)))
+        written = 0
+        for records in _iter_corpus_chunks(_corpus_chunk, chunks, workers, initargs):
+            output.write(records)
+            written += records.count("\n")  # json.dumps escapes newlines inside records
+        return written
+    
+    limit = min(count, muse.estimate_poem_space(language, theme, emotion, form, lines))
+    seen = BloomFilter(limit, bloom_error_rate) if bloom_error_rate else FingerprintSet(limit)
+    chunks = ((seed, index, index * chunk_size, chunk_size) for index in itertools.count())
+    results = _iter_corpus_chunks(_corpus_unique_chunk, chunks, workers, initargs)
+    written = misses = 0
+    try:
+        for candidates in results:
+            for fingerprint, record in candidates:
+                if not seen.add(fingerprint):
+                    misses += 1
+                    if misses >= max_misses:
+                        return written
+                    continue
+                output.write(f'{{"id": {written}, {record[1:]}\n')
+                written += 1
+                misses = 0
+                if written >= limit:
+                    return written
+    finally:
+        results.close()
+    return written
+
+
 def main():
     """Main function to run the MuseLingo poetry generator from command line."""
     parser = argparse.ArgumentParser(description="MuseLingo: Multilingual Poetry Generator")
@@ -386,11 +2937,34 @@ def main():
                         help="Number of lines (for forms other than haiku and tanka)")
     parser.add_argument("--translate", "-tr", type=str, default=None,
                         help="Translate to this language")
+    parser.add_argument("--seed", "-s", type=int, default=None,
+                        help="Random seed for reproducible output")
+    parser.add_argument("--count", "-c", type=int, default=None,
+                        help="Bulk mode: generate this many poems as JSON lines")
+    parser.add_argument("--workers", "-w", type=int, default=1,
+                        help="Bulk mode: number of worker processes (0 for one per CPU)")
+    parser.add_argument("--output", "-o", type=str, default="-",
+                        help="Bulk mode: output file for the JSON lines ('-' for stdout)")
+    parser.add_argument("--profile", type=str, nargs="?", const="json", default=None,
+                        choices=sorted(METRIC_EXPORTERS),
+                        help="Print per-stage timings of the run to stderr (json or prometheus)")
+    parser.add_argument("--unique", "-u", action="store_true",
+                        help="Bulk mode: never repeat a poem, stopping early if the combination runs out")
+    parser.add_argument("--bloom", type=float, default=None, metavar="ERROR_RATE",
+                        help="Bulk mode: with --unique, track poems in a Bloom filter with this false positive rate")
     
     args = parser.parse_args()
+    for option in ("count", "workers", "lines"):
+        value = getattr(args, option)
+        if value is not None and value < 0:
+            parser.error(f"--{option} must not be negative")
+    
+    if args.count is not None:
+        _run_corpus(args)
+        return
     
     try:
-        muse = MuseLingo()
+        muse = MuseLingo(metrics=Metrics() if args.profile else None)
         
         # Print available options
         print("MuseLingo: A Multilingual Poetry Generator")
@@ -408,15 +2982,43 @@ def main():
             translator = muse.build_translator(args.language, args.translate)
             print(f"(With translation to {args.translate})")
         
+        rng = random.Random(args.seed) if args.seed is not None else None
         poem = muse.generate_poem(args.language, args.theme, args.emotion, 
-                                  args.form, args.lines, translator)
+                                  args.form, args.lines, translator, rng)
         
         for line in poem:
             print(line)
+        
+        if args.profile:
+            print(muse.metrics.export(args.profile), file=sys.stderr)
             
     except Exception as e:
         print(f"Error: {e}")
 
 
+def _run_corpus(args: argparse.Namespace) -> None:
+    """Run the command line bulk mode and report progress on stderr."""
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    workers = args.workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    options = {"unique": args.unique, "bloom_error_rate": args.bloom}
+    try:
+        if args.output == "-":
+            written = generate_corpus(sys.stdout, args.count, args.language, args.theme, args.emotion,
+                                      args.form, args.lines, args.translate, seed, workers, **options)
+        else:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                written = generate_corpus(f, args.count, args.language, args.theme, args.emotion,
+                                          args.form, args.lines, args.translate, seed, workers, **options)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {written} poems with seed {seed} using {workers} worker(s) "
+          f"in {elapsed:.2f}s", file=sys.stderr)
+    if written < args.count:
+        print("Stopped early: the combination ran out of distinct poems", file=sys.stderr)
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,356 @@
+import argparse
+import collections
+import json
+import random
+import threading
+import time
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from muse_lingo import MuseLingo, percentile, stream_rng
+
+# MuseLingo pre-generation pool
+# Keeps bounded ring buffers of ready poems for the most requested keys,
+# topped up by background worker threads, so serving a request is a buffer
+# pop instead of generating (and translating) on the request path.
+# Run with: python muse_pool.py [--requests 20000] [--rate 2000] [--capacity 32]
+
+# (language, theme, emotion, form, lines, translate target or None)
+PoolKey = Tuple[str, str, str, str, int, Optional[str]]
+
+# A key's demand is its request count, halving every DEMAND_HALF_LIFE seconds.
+# Keys below MIN_DEMAND are no longer refilled.
+DEMAND_HALF_LIFE = 10.0
+MIN_DEMAND = 0.05
+
+# Refill lag runs from a buffer dropping to this share of its capacity until
+# it is full again
+LOW_WATER = 0.5
+
+
+class ReadyPoem(NamedTuple):
+    """A pre-generated poem and, for keys with a translate target, its translation."""
+    poem: List[str]
+    translation: Optional[List[str]]
+
+
+class _Buffer:
+    """Ready poems for one key, with its demand and refill state."""
+    __slots__ = ("poems", "epoch", "pending", "demand", "touched", "low_since")
+
+    def __init__(self, capacity: int, now: float):
+        self.poems: Deque[ReadyPoem] = collections.deque(maxlen=capacity)
+        self.epoch = 0  # Bumped on invalidation; refills of an older epoch are dropped
+        self.pending = 0  # Poems being generated for this buffer right now
+        self.demand = 0.0
+        self.touched = now
+        self.low_since: Optional[float] = now
+
+    def demand_at(self, now: float) -> float:
+        """The decayed request count at ``now``."""
+        return self.demand * 0.5 ** ((now - self.touched) / DEMAND_HALF_LIFE)
+
+
+class PoemPool:
+    """Pre-generated poems per hot request key, refilled in the background.
+
+    ``get`` pops a ready poem when the key's buffer has one (a hit) and
+    otherwise generates it inline (a miss). Every request adds to its key's
+    demand. At most ``max_keys`` keys keep a buffer, and a new key displaces
+    the least demanded one once that has cooled below a single request.
+    Workers always top up the buffer that would run dry soonest at its
+    current demand. Buffers are emptied when add_vocabulary changes the
+    words or translator they were generated from.
+    """
+
+    def __init__(self, muse: Optional[MuseLingo] = None, capacity: int = 32, max_keys: int = 64,
+                 workers: int = 1, refill_batch: int = 8, seed: Optional[int] = None):
+        self.muse = muse or MuseLingo(concurrent=True)
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self.refill_batch = refill_batch
+        self._worker_count = workers
+        self._seed = seed
+        self._buffers: Dict[PoolKey, _Buffer] = {}
+        self._lock = threading.Lock()
+        self._wanted = threading.Condition(self._lock)
+        self._workers: List[threading.Thread] = []
+        self._stopping = False
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.refilled = 0
+        self.discarded = 0
+        self.invalidations = 0
+        self.failures = 0
+        self.last_failure: Optional[str] = None
+        self._lags: Deque[float] = collections.deque(maxlen=10000)
+
+    def start(self) -> None:
+        """Start the refill workers and follow vocabulary changes."""
+        self._stopping = False
+        self.muse.add_change_listener(self._vocabulary_changed)
+        for index in range(self._worker_count):
+            rng = stream_rng(self._seed, index) if self._seed is not None else random.Random()
+            worker = threading.Thread(target=self._work, args=(rng,), name=f"muse-pool-{index}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self) -> None:
+        """Stop the refill workers, keeping whatever is buffered."""
+        with self._lock:
+            self._stopping = True
+            self._wanted.notify_all()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        self.muse.remove_change_listener(self._vocabulary_changed)
+
+    def __enter__(self) -> "PoemPool":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def get(self, language: str, theme: str, emotion: str, form: str, lines: int = 6,
+            translate: Optional[str] = None) -> ReadyPoem:
+        """Return a poem for a request, from its buffer when one is ready.
+
+        Raises ValueError for requests MuseLingo rejects, like generate_poem.
+        """
+        key = (language, theme, emotion, form, lines, translate)
+        now = time.perf_counter()
+        ready = None
+        with self._lock:
+            buffer = self._buffers.get(key)
+            if buffer is not None:
+                buffer.demand = buffer.demand_at(now) + 1
+                buffer.touched = now
+                if buffer.poems:
+                    ready = buffer.poems.popleft()
+                if buffer.low_since is None and len(buffer.poems) <= self.capacity * LOW_WATER:
+                    # Idle workers only wake at the low-water mark, so refills come in batches
+                    buffer.low_since = now
+                    self._wanted.notify()
+            if ready is not None:
+                self.hits += 1
+                return ready
+            self.misses += 1
+        # Generated before the key is admitted, so invalid requests never get a buffer
+        ready = self._generate(key, None)
+        if buffer is None:
+            self._admit(key, now)
+        return ready
+
+    def _admit(self, key: PoolKey, now: float) -> None:
+        """Give a newly requested key a buffer if it is in demand enough."""
+        with self._lock:
+            if key in self._buffers:
+                return
+            if len(self._buffers) >= self.max_keys:
+                coldest = min(self._buffers, key=lambda other: self._buffers[other].demand_at(now))
+                if self._buffers[coldest].demand_at(now) >= 1:
+                    return  # Every buffered key is hotter than a single request
+                del self._buffers[coldest]
+            buffer = self._buffers[key] = _Buffer(self.capacity, now)
+            buffer.demand = 1.0
+            self._wanted.notify()
+
+    def _generate(self, key: PoolKey, rng: Optional[random.Random]) -> ReadyPoem:
+        """Generate one poem for a key, translating it if the key asks for that."""
+        language, theme, emotion, form, lines, translate = key
+        poem = self.muse.generate_poem(language, theme, emotion, form, lines, rng=rng)
+        if translate is None:
+            return ReadyPoem(poem, None)
+        return ReadyPoem(poem, self.muse.translate_poem(poem, self.muse.build_translator(language, translate)))
+
+    def _most_urgent(self, now: float) -> Optional[Tuple[PoolKey, _Buffer]]:
+        """Pick the buffer that would run dry soonest at its demand; call with the lock held."""
+        best = None
+        best_urgency = 0.0
+        for key, buffer in self._buffers.items():
+            stocked = len(buffer.poems) + buffer.pending
+            if stocked >= self.capacity:
+                continue
+            demand = buffer.demand_at(now)
+            if demand < MIN_DEMAND:
+                continue
+            urgency = demand / (stocked + 1)
+            if urgency > best_urgency:
+                best, best_urgency = (key, buffer), urgency
+        return best
+
+    def _work(self, rng: random.Random) -> None:
+        """Refill buffers in order of urgency until the pool stops."""
+        while True:
+            with self._lock:
+                while True:
+                    if self._stopping:
+                        return
+                    chosen = self._most_urgent(time.perf_counter())
+                    if chosen is not None:
+                        break
+                    self._wanted.wait()
+                key, buffer = chosen
+                count = min(self.refill_batch, self.capacity - len(buffer.poems) - buffer.pending)
+                buffer.pending += count
+                epoch = buffer.epoch
+            poems = []
+            error = None
+            try:
+                for _ in range(count):
+                    poems.append(self._generate(key, rng))
+                    # Hand the GIL back between poems so requests are not held up
+                    time.sleep(0)
+            except Exception as e:
+                error = e
+            finally:
+                self._store(key, buffer, epoch, count, poems, error)
+
+    def _store(self, key: PoolKey, buffer: _Buffer, epoch: int, count: int, poems: List[ReadyPoem],
+               error: Optional[Exception] = None) -> None:
+        """Settle a refill: add its poems to their buffer, or drop the buffer if it failed.
+
+        Poems for a buffer that was invalidated or dropped meanwhile are discarded.
+        """
+        with self._lock:
+            if error is not None and not isinstance(error, ValueError):
+                self.failures += 1
+                self.last_failure = f"{type(error).__name__}: {error}"
+            if self._buffers.get(key) is not buffer:
+                self.discarded += len(poems)
+                return
+            if error is not None:
+                # A ValueError means the key stopped being valid, e.g. after
+                # language_data was replaced; anything else would likely fail
+                # again on every retry. Either way requests for the key now
+                # generate inline, so the error reaches the caller.
+                del self._buffers[key]
+                self.discarded += len(poems)
+                return
+            if buffer.epoch != epoch:
+                self.discarded += len(poems)
+                return
+            buffer.pending -= count
+            buffer.poems.extend(poems)
+            self.refills += 1
+            self.refilled += len(poems)
+            if buffer.low_since is not None and len(buffer.poems) >= self.capacity:
+                self._lags.append(time.perf_counter() - buffer.low_since)
+                buffer.low_since = None
+
+    def _vocabulary_changed(self, language: Optional[str], theme: Optional[str]) -> None:
+        """Empty the buffers whose poems or translations a vocabulary change made stale."""
+        now = time.perf_counter()
+        with self._lock:
+            for key, buffer in self._buffers.items():
+                if language is None or (key[0] == language and key[1] == theme) or key[5] == language:
+                    self.discarded += len(buffer.poems)
+                    buffer.poems.clear()
+                    buffer.epoch += 1
+                    buffer.pending = 0
+                    if buffer.low_since is None:
+                        buffer.low_since = now
+                    self.invalidations += 1
+            self._wanted.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit, miss and refill statistics as a JSON-serializable dict."""
+        now = time.perf_counter()
+        with self._lock:
+            lags = sorted(self._lags)
+            requests = self.hits + self.misses
+            hottest = sorted(self._buffers.items(), key=lambda item: -item[1].demand_at(now))[:10]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "refills": self.refills,
+                "refilled_poems": self.refilled,
+                "discarded_poems": self.discarded,
+                "invalidations": self.invalidations,
+                "failures": self.failures,
+                "last_failure": self.last_failure,
+                "keys": len(self._buffers),
+                "buffered_poems": sum(len(buffer.poems) for buffer in self._buffers.values()),
+                "refill_lag_p50_ms": percentile(lags, 0.50) * 1000,
+                "refill_lag_p99_ms": percentile(lags, 0.99) * 1000,
+                "refill_lag_max_ms": (lags[-1] if lags else 0.0) * 1000,
+                "hottest": [{"key": "/".join(str(part) for part in key if part is not None),
+                             "demand": buffer.demand_at(now), "buffered": len(buffer.poems)}
+                            for key, buffer in hottest],
+            }
+
+
+def _simulate(muse: MuseLingo, pool: Optional[PoemPool], requests: int, rate: float, keys: int,
+              translate_ratio: float, seed: int) -> List[float]:
+    """Serve a skewed stream of requests at ``rate`` per second; return each request's latency."""
+    rand = random.Random(seed)
+    specs = []
+    for _ in range(keys):
+        language = rand.choice(muse.languages)
+        translate = None
+        if rand.random() < translate_ratio:
+            translate = rand.choice([other for other in muse.languages if other != language])
+        specs.append((language, rand.choice(muse.themes), rand.choice(muse.emotions),
+                      rand.choice(muse.poetry_forms), 6, translate))
+    # Zipf-like popularity: the k-th key is requested in proportion to 1 / k
+    popularity = [1 / rank for rank in range(1, keys + 1)]
+    stream = rand.choices(specs, popularity, k=requests)
+    latencies = []
+    started = time.perf_counter()
+    for i, spec in enumerate(stream):
+        delay = started + i / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        request_started = time.perf_counter()
+        if pool is not None:
+            pool.get(*spec)
+        else:
+            language, theme, emotion, form, lines, translate = spec
+            poem = muse.generate_poem(language, theme, emotion, form, lines)
+            if translate:
+                muse.translate_poem(poem, muse.build_translator(language, translate))
+        latencies.append(time.perf_counter() - request_started)
+    return latencies
+
+
+def main():
+    """Compare request latency with and without the pool on a simulated workload."""
+    parser = argparse.ArgumentParser(description="MuseLingo pre-generation pool")
+    parser.add_argument("--requests", "-n", type=int, default=20000, help="Requests to serve")
+    parser.add_argument("--rate", type=float, default=2000, help="Requests per second")
+    parser.add_argument("--keys", type=int, default=40, help="Distinct request keys, Zipf-distributed")
+    parser.add_argument("--capacity", type=int, default=32, help="Poems buffered per key")
+    parser.add_argument("--max-keys", type=int, default=64, help="Keys that keep a buffer")
+    parser.add_argument("--workers", type=int, default=1, help="Refill threads")
+    parser.add_argument("--translate-ratio", type=float, default=0.3, help="Share of keys with a translation")
+    parser.add_argument("--seed", "-s", type=int, default=0, help="Seed for the workload")
+    parser.add_argument("--json", action="store_true", help="Print the full results as JSON")
+    args = parser.parse_args()
+
+    muse = MuseLingo(concurrent=True)
+    muse.compile_translators()
+    results = {}
+    direct = sorted(_simulate(muse, None, args.requests, args.rate, args.keys, args.translate_ratio, args.seed))
+    with PoemPool(muse, args.capacity, args.max_keys, args.workers, seed=args.seed) as pool:
+        pooled = sorted(_simulate(muse, pool, args.requests, args.rate, args.keys, args.translate_ratio,
+                                  args.seed))
+        results["pool"] = pool.stats()
+    for name, latencies in (("direct", direct), ("pooled", pooled)):
+        results[name] = {"p50_us": percentile(latencies, 0.50) * 1e6,
+                         "p99_us": percentile(latencies, 0.99) * 1e6,
+                         "max_us": latencies[-1] * 1e6}
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        return
+    for name in ("direct", "pooled"):
+        print(f"{name:>6}: p50 {results[name]['p50_us']:.1f} us, p99 {results[name]['p99_us']:.1f} us, "
+              f"max {results[name]['max_us']:.1f} us")
+    stats = results["pool"]
+    print(f"Pool: hit rate {stats['hit_rate']:.1%} ({stats['misses']} misses), {stats['refills']} refills, "
+          f"refill lag p50 {stats['refill_lag_p50_ms']:.2f} ms, p99 {stats['refill_lag_p99_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
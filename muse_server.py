@@ -0,0 +1,457 @@
+import argparse
+import asyncio
+import collections
+import json
+import random
+import time
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from muse_lingo import Metrics, MuseLingo, percentile
+from muse_pool import PoemPool
+
+# MuseLingo HTTP service
+# A standard-library asyncio server that keeps one MuseLingo instance warm and
+# pools concurrent requests into micro-batches.
+#
+#   GET  /generate?language=english&theme=love&emotion=joy&form=haiku[&lines=6][&translate=french]
+#   POST /generate   {"language": ..., "theme": ..., "emotion": ..., "form": ..., "lines": 6, "translate": ...}
+#   POST /translate  {"source": "english", "target": "french", "lines": ["..."]}
+#   GET  /stats      latency percentiles, throughput, batch sizes and pool hit rates
+#   GET  /metrics    per-stage pipeline metrics in the Prometheus text format
+#   GET  /health
+
+# Most lines a generated poem or a translate request may have, so one request
+# cannot hold the event loop for long
+MAX_REQUEST_LINES = 100
+
+# Largest request body and most header fields read from one request
+MAX_BODY_BYTES = 1 << 20
+MAX_HEADERS = 100
+
+# Exceptions that mean the client sent a bad request rather than a server fault
+_BAD_REQUEST = (KeyError, TypeError, ValueError, OverflowError)
+
+
+class HTTPError(Exception):
+    """An error that maps directly onto an HTTP error response."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class PlainText(str):
+    """A response body sent as text rather than JSON."""
+
+
+class LatencyStats:
+    """Request counts, latency percentiles and throughput for one endpoint.
+
+    Latencies are kept in a bounded window of the most recent requests, so
+    percentiles track current behaviour and memory stays constant.
+    """
+
+    def __init__(self, window: int = 10000):
+        self.count = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+        self._latencies: Deque[float] = collections.deque(maxlen=window)
+        self._finished: Deque[float] = collections.deque(maxlen=window)
+
+    def record(self, seconds: float, error: bool = False) -> None:
+        """Record one finished request."""
+        self.count += 1
+        if error:
+            self.errors += 1
+        self._latencies.append(seconds)
+        self._finished.append(time.perf_counter())
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Summarize the endpoint as a JSON-serializable dict."""
+        latencies = sorted(self._latencies)
+        now = time.perf_counter()
+        # Throughput over the window of recent requests, or since start if few
+        span = now - self._finished[0] if len(self._finished) > 1 else now - self.started
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+            "throughput_rps": len(self._finished) / span if span > 0 else 0.0,
+        }
+
+
+class MicroBatcher:
+    """Pools submitted items into batches processed by one synchronous call.
+
+    A batch is flushed when it reaches ``max_batch`` items or when its first
+    item has waited ``latency_budget`` seconds, whichever comes first. The
+    ``process`` callable gets the list of items and returns one result per
+    item, or an exception instance to fail just that item.
+    """
+
+    def __init__(self, process: Callable[[List[Any]], List[Any]], max_batch: int = 64,
+                 latency_budget: float = 0.002):
+        self.process = process
+        self.max_batch = max_batch
+        self.latency_budget = latency_budget
+        self.batches = 0
+        self.items = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the batching task on the running event loop."""
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the batching task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, item: Any) -> Any:
+        """Queue an item and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.latency_budget
+            while len(batch) < self.max_batch:
+                if queue.empty():
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(queue.get_nowait())
+            self._flush(batch)
+
+    def _flush(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = self.process([item for item, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue  # The client went away
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Summarize batching as a JSON-serializable dict."""
+        return {"batches": self.batches, "items": self.items,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0}
+
+
+class MuseServer:
+    """Serves MuseLingo over HTTP from one warm instance with micro-batching.
+
+    With ``pool_size``, /generate is served from a PoemPool keeping that
+    many ready poems per hot request instead of going through a batch.
+    """
+
+    def __init__(self, muse: Optional[MuseLingo] = None, max_batch: int = 64,
+                 latency_budget: float = 0.002, seed: Optional[int] = None,
+                 pool_size: int = 0, pool_workers: int = 1):
+        self.muse = muse or MuseLingo(metrics=Metrics())
+        self._rng = random.Random(seed)
+        self.pool = PoemPool(self.muse, pool_size, workers=pool_workers, seed=seed) if pool_size else None
+        self.generate_batcher = MicroBatcher(self._generate_batch, max_batch, latency_budget)
+        self.translate_batcher = MicroBatcher(self._translate_batch, max_batch, latency_budget)
+        self.stats: Dict[str, LatencyStats] = collections.defaultdict(LatencyStats)
+        self.started = time.perf_counter()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> Tuple[str, int]:
+        """Warm the instance, start listening and return the bound address."""
+        # Translators are compiled once here and reused by every request
+        self.muse.compile_translators()
+        self.generate_batcher.start()
+        self.translate_batcher.start()
+        if self.pool is not None:
+            self.pool.start()
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def stop(self) -> None:
+        """Stop listening and cancel the batchers and the pool."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.generate_batcher.stop()
+        await self.translate_batcher.stop()
+        if self.pool is not None:
+            self.pool.stop()
+
+    # Batch processing
+
+    def _generate_batch(self, requests: List[Dict[str, Any]]) -> List[Any]:
+        """Generate every poem of a micro-batch with one iter_poems pass."""
+        results: List[Any] = []
+        specs = []
+        for request in requests:
+            try:
+                spec = _generate_spec(request)
+                self.muse.validate_request(*spec[:4])
+                translate = request.get("translate")
+                translator = self.muse.build_translator(spec[0], translate) if translate else None
+            except _BAD_REQUEST as e:
+                results.append(HTTPError(400, _describe(e)))
+                continue
+            results.append((spec, translate, translator))
+            specs.append(spec)
+        poems = self.muse.iter_poems(specs, seed=self._rng.getrandbits(64))
+        for i, result in enumerate(results):
+            if isinstance(result, Exception):
+                continue
+            spec, translate, translator = result
+            poem = next(poems)
+            response = {"language": spec[0], "theme": spec[1], "emotion": spec[2], "form": spec[3],
+                        "poem": poem}
+            if translator:
+                response["translation"] = {"language": translate, "poem": self.muse.translate_poem(poem, translator)}
+            results[i] = response
+        return results
+
+    def _generate_pooled(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Serve a generate request from the pre-generation pool."""
+        try:
+            spec = _generate_spec(request)
+            translate = request.get("translate") or None
+            ready = self.pool.get(*spec, translate=translate)
+        except _BAD_REQUEST as e:
+            raise HTTPError(400, _describe(e))
+        response = {"language": spec[0], "theme": spec[1], "emotion": spec[2], "form": spec[3],
+                    "poem": ready.poem}
+        if ready.translation is not None:
+            response["translation"] = {"language": translate, "poem": ready.translation}
+        return response
+
+    def _translate_batch(self, requests: List[Dict[str, Any]]) -> List[Any]:
+        """Translate every request of a micro-batch with the cached translators."""
+        results: List[Any] = []
+        for request in requests:
+            try:
+                translator = self.muse.build_translator(request["source"], request["target"])
+                lines = request["lines"]
+                if isinstance(lines, str):
+                    lines = lines.splitlines()
+                if not isinstance(lines, list) or not all(isinstance(line, str) for line in lines):
+                    raise ValueError("lines must be a string or a list of strings")
+                if len(lines) > MAX_REQUEST_LINES:
+                    raise ValueError(f"At most {MAX_REQUEST_LINES} lines can be translated at once")
+                results.append({"source": request["source"], "target": request["target"],
+                                "lines": list(translator.translate_lines(lines))})
+            except _BAD_REQUEST as e:
+                results.append(HTTPError(400, _describe(e)))
+            except Exception as e:
+                results.append(e)  # Fails only this request, with a 500
+        return results
+
+    # HTTP
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    # The stream may be mid-request, so answer and close it
+                    await self._respond(writer, e.status, {"error": str(e)}, False)
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and version.upper() == "HTTP/1.1")
+                status, payload = await self._dispatch(method.upper(), target, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader
+                            ) -> Optional[Tuple[str, str, str, Dict[str, str], bytes]]:
+        """Read one request as (method, target, version, headers, body), or None at end of stream.
+
+        Raises HTTPError for a request that is malformed or too large.
+        """
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return None
+            try:
+                method, target, version = request_line.decode("latin-1").split()
+            except ValueError:
+                raise HTTPError(400, "Malformed request line")
+            headers = {}
+            for _ in range(MAX_HEADERS + 1):
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            else:
+                raise HTTPError(431, f"More than {MAX_HEADERS} header fields")
+        except (ValueError, asyncio.LimitOverrunError):
+            # readline refuses lines longer than the stream limit
+            raise HTTPError(431, "Request line or header field too long")
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise HTTPError(400, "Malformed Content-Length")
+        if length < 0:
+            raise HTTPError(400, "Malformed Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Request body larger than {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method, target, version, headers, body
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Any]:
+        """Route a request and record its latency."""
+        url = urlsplit(target)
+        path = url.path.rstrip("/") or "/"
+        started = time.perf_counter()
+        status, payload = 200, None
+        try:
+            if path == "/health":
+                payload = {"status": "ok"}
+            elif path == "/stats":
+                payload = self.stats_snapshot()
+            elif path == "/metrics":
+                if self.muse.metrics is None:
+                    raise HTTPError(404, "Metrics are not enabled")
+                payload = PlainText(self.muse.metrics.export("prometheus"))
+            elif path in ("/generate", "/translate"):
+                if method == "POST":
+                    try:
+                        request = json.loads(body or b"{}")
+                    except ValueError:
+                        raise HTTPError(400, "Request body must be JSON")
+                    if not isinstance(request, dict):
+                        raise HTTPError(400, "Request body must be a JSON object")
+                elif method == "GET":
+                    request = dict(parse_qsl(url.query))
+                else:
+                    raise HTTPError(405, f"Method {method} not allowed")
+                if path == "/generate" and self.pool is not None:
+                    payload = self._generate_pooled(request)
+                else:
+                    batcher = self.generate_batcher if path == "/generate" else self.translate_batcher
+                    payload = await batcher.submit(request)
+            else:
+                raise HTTPError(404, f"No route for {path}")
+        except HTTPError as e:
+            status, payload = e.status, {"error": str(e)}
+        except Exception:
+            status, payload = 500, {"error": _REASONS[500]}
+        if path in ("/generate", "/translate"):
+            self.stats[path].record(time.perf_counter() - started, status != 200)
+        return status, payload
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool) -> None:
+        if isinstance(payload, PlainText):
+            body = payload.encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, 'Error')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    def stats_snapshot(self) -> Dict[str, Any]:
+        """Latency, throughput, batching and pool statistics for every endpoint."""
+        stats = {
+            "uptime_s": time.perf_counter() - self.started,
+            "endpoints": {path: stats.snapshot() for path, stats in self.stats.items()},
+            "batching": {"generate": self.generate_batcher.snapshot(),
+                         "translate": self.translate_batcher.snapshot()},
+            "translators_cached": self.muse.translator_count(),
+        }
+        if self.pool is not None:
+            stats["pool"] = self.pool.stats()
+        return stats
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Content Too Large",
+            431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+
+def _generate_spec(request: Dict[str, Any]) -> Tuple[str, str, str, str, int]:
+    """Read the poem fields of a generate request, checking its line count."""
+    spec = (request["language"], request["theme"], request["emotion"], request["form"],
+            int(request.get("lines", 6)))
+    if not 1 <= spec[4] <= MAX_REQUEST_LINES:
+        raise ValueError(f"lines must be between 1 and {MAX_REQUEST_LINES}")
+    return spec
+
+
+def _describe(error: Exception) -> str:
+    """Turn a validation error into a client-facing message."""
+    if isinstance(error, KeyError):
+        return f"Missing field: {error.args[0]}"
+    return str(error)
+
+
+async def serve(host: str = "127.0.0.1", port: int = 8080, data_path: str = "poetry_data.json",
+                max_batch: int = 64, latency_budget: float = 0.002, pool_size: int = 0,
+                pool_workers: int = 1) -> None:
+    """Run the HTTP service until cancelled."""
+    server = MuseServer(MuseLingo(data_path, metrics=Metrics()), max_batch, latency_budget,
+                        pool_size=pool_size, pool_workers=pool_workers)
+    host, port = await server.start(host, port)
+    print(f"MuseLingo server listening on http://{host}:{port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    """Run the MuseLingo HTTP service from the command line."""
+    parser = argparse.ArgumentParser(description="MuseLingo HTTP service")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", "-p", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--data", type=str, default="poetry_data.json", help="Language data file")
+    parser.add_argument("--batch-size", type=int, default=64, help="Largest micro-batch")
+    parser.add_argument("--latency-budget-ms", type=float, default=2.0,
+                        help="Longest a request waits for its micro-batch to fill")
+    parser.add_argument("--pool-size", type=int, default=0,
+                        help="Serve /generate from a pre-generation pool with this many poems per hot request")
+    parser.add_argument("--pool-workers", type=int, default=1, help="Threads refilling the pool")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.data, args.batch_size, args.latency_budget_ms / 1000,
+                          args.pool_size, args.pool_workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
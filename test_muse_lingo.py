@@ -0,0 +1,104 @@
+import os
+import random
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from muse_lingo import CONCEPT_DIGITS, MuseLingo, stream_rng
+
+
+class MuseLingoTestCase(unittest.TestCase):
+    """Runs every test on the built-in default data in a scratch directory."""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.muse = self.new_muse()
+
+    def new_muse(self, **kwargs) -> MuseLingo:
+        return MuseLingo(os.path.join(self._tmp.name, "missing.json"), **kwargs)
+
+
+class WeightTests(MuseLingoTestCase):
+    def test_add_vocabulary_rejects_weights_with_zero_total(self):
+        words = list(self.muse.language_data["english"]["words"]["hope"])
+        with self.assertRaises(ValueError):
+            self.muse.add_vocabulary("english", "hope", words, [0.0] * len(words))
+
+    def test_poem_space_skips_zero_weight_words(self):
+        words = list(self.muse.language_data["english"]["words"]["love"])
+        self.muse.add_vocabulary("english", "love", words, [1.0] + [0.0] * (len(words) - 1))
+        space = self.muse.estimate_poem_space("english", "love", "joy", "free_verse", 1)
+        poems = {tuple(poem) for poem in self.muse.iter_unique_poems(
+            "english", "love", "joy", "free_verse", 1, seed=0, max_misses=10000)}
+        self.assertGreaterEqual(space, len(poems))
+        self.assertLess(space, len(poems) * 1.01)
+
+
+class ConceptTests(MuseLingoTestCase):
+    def test_concept_poems_render_any_vocabulary_size(self):
+        size = 2 * CONCEPT_DIGITS + 100
+        for language in self.muse.languages:
+            self.muse.add_vocabulary(language, "nature", [f"{language}{i}" for i in range(size)])
+        for seed in range(20):
+            for form in self.muse.poetry_forms:
+                poem = self.muse.generate_concept_poem("nature", "wonder", form, 5, random.Random(seed))
+                rendered = self.muse.render_poem(poem)
+                self.assertEqual(rendered["english"], self.muse.generate_poem(
+                    "english", "nature", "wonder", form, 5, rng=random.Random(seed)))
+                self.assertEqual(len(rendered["french"]), len(poem.lines))
+
+
+class ConcurrencyTests(MuseLingoTestCase):
+    TASKS = 40
+    TASK_POEMS = 25
+
+    def specs(self, muse: MuseLingo):
+        return [(language, theme, "wonder", form)
+                for language in muse.languages for theme in muse.themes for form in muse.poetry_forms]
+
+    def test_seeded_streams_match_across_threads(self):
+        specs = self.specs(self.muse)
+
+        def seeded_task(task):
+            rng = stream_rng(0, task)
+            return [self.muse.generate_poem(*specs[task % len(specs)], rng=rng) for _ in range(self.TASK_POEMS)]
+        expected = list(map(seeded_task, range(self.TASKS)))
+        with ThreadPoolExecutor(4) as pool:
+            self.assertEqual(list(pool.map(seeded_task, range(self.TASKS))), expected)
+
+    def test_poems_stay_whole_while_vocabulary_grows(self):
+        shapes = {spec: len(self.muse.generate_poem(*spec, rng=stream_rng(0, 0)))
+                  for spec in self.specs(self.muse)}
+        shared = self.new_muse(concurrent=True)
+        specs = self.specs(shared)
+        stop = threading.Event()
+
+        def write():
+            added = 0
+            while not stop.is_set():
+                theme = shared.themes[added % len(shared.themes)]
+                shared.add_vocabulary(shared.languages[added % len(shared.languages)], theme, [f"{theme}{added}"])
+                added += 1
+                stop.wait(0.001)
+
+        def unseeded_task(task):
+            spec = specs[task % len(specs)]
+            return spec, [shared.generate_poem(*spec) for _ in range(self.TASK_POEMS)]
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            with ThreadPoolExecutor(4) as pool:
+                produced = list(pool.map(unseeded_task, range(self.TASKS)))
+        finally:
+            stop.set()
+            writer.join()
+        for spec, poems in produced:
+            for poem in poems:
+                self.assertEqual(len(poem), shapes[spec])
+                self.assertTrue(all(poem))
+
+
+if __name__ == "__main__":
+    unittest.main()